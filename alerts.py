@@ -0,0 +1,264 @@
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rates import RateMatrix
+from sqlite_store import SQLiteStore
+
+# Условия уведомления: курс выше или ниже порога
+ABOVE = ">"
+BELOW = "<"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    base TEXT NOT NULL,
+    quote TEXT NOT NULL,
+    direction TEXT NOT NULL CHECK (direction IN ('>', '<')),
+    threshold REAL NOT NULL CHECK (threshold > 0),
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_pair ON alerts (base, quote, direction, threshold, id);
+"""
+
+COLUMNS = "id, user_id, chat_id, base, quote, direction, threshold, created_at"
+
+# Сколько id передавать в один запрос IN (...): лимит параметров старых SQLite - 999
+ID_BATCH = 500
+
+# Ключ индекса: (base, quote, условие)
+IndexKey = Tuple[str, str, str]
+
+
+# Подписка на курс: уведомить, когда 1 base станет дороже (>) или дешевле (<) threshold quote
+class Alert:
+    __slots__ = (
+        "id", "user_id", "chat_id", "base", "quote", "direction", "threshold", "created_at",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        chat_id: int,
+        base: str,
+        quote: str,
+        direction: str,
+        threshold: float,
+        created_at: float,
+    ) -> None:
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.base = base
+        self.quote = quote
+        self.direction = direction
+        self.threshold = threshold
+        self.created_at = created_at
+
+
+# Выполнено ли условие "курс выше/ниже порога" при курсе rate
+def is_triggered(direction: str, threshold: float, rate: float) -> bool:
+    if direction == ABOVE:
+        return rate > threshold
+    return rate < threshold
+
+
+# Пороги подписок одной пары с одним условием: отсортированный массив порогов
+# и параллельный массив id (16 байт на подписку, без объектов Python).
+# Подписка срабатывает один раз и удаляется, поэтому все оставшиеся пороги ">"
+# лежат выше последнего курса, а "<" - ниже. Сработавшие при новом курсе - ровно
+# пересечённый им интервал: начало массива для ">" или конец для "<", одна
+# двоичная цепочка поиска и один срез, сколько бы подписок ни было.
+class ThresholdIndex:
+    __slots__ = ("direction", "thresholds", "ids")
+
+    def __init__(self, direction: str) -> None:
+        self.direction = direction
+        self.thresholds = array("d")
+        self.ids = array("q")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, threshold: float, alert_id: int) -> None:
+        pos = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(pos, threshold)
+        self.ids.insert(pos, alert_id)
+
+    # Удаление подписки: поиск среди равных порогов
+    def remove(self, threshold: float, alert_id: int) -> bool:
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold, lo)
+        for pos in range(lo, hi):
+            if self.ids[pos] == alert_id:
+                del self.thresholds[pos]
+                del self.ids[pos]
+                return True
+        return False
+
+    # id подписок, сработавших при курсе rate; они удаляются из индекса
+    def pop_triggered(self, rate: float) -> array:
+        if self.direction == ABOVE:
+            end = bisect_left(self.thresholds, rate)
+            triggered = self.ids[:end]
+            del self.thresholds[:end]
+            del self.ids[:end]
+        else:
+            start = bisect_right(self.thresholds, rate)
+            triggered = self.ids[start:]
+            del self.thresholds[start:]
+            del self.ids[start:]
+        return triggered
+
+
+# Индекс подписок всех пар в памяти; сами подписки хранятся в AlertStore
+class AlertIndex:
+    def __init__(self) -> None:
+        self._indexes: Dict[IndexKey, ThresholdIndex] = {}
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+    def _index(self, key: IndexKey) -> ThresholdIndex:
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = ThresholdIndex(key[2])
+        return index
+
+    def add(self, alert: Alert) -> None:
+        self._index((alert.base, alert.quote, alert.direction)).add(alert.threshold, alert.id)
+
+    def remove(self, alert: Alert) -> bool:
+        index = self._indexes.get((alert.base, alert.quote, alert.direction))
+        return index is not None and index.remove(alert.threshold, alert.id)
+
+    # id сработавших подписок при новом снимке курсов: по два двоичных поиска на пару
+    def pop_triggered(self, matrix: RateMatrix) -> List[int]:
+        triggered: List[int] = []
+        for (base, quote, _), index in self._indexes.items():
+            rate = matrix.rate(base, quote)
+            if rate is not None and index:
+                triggered.extend(index.pop_triggered(rate))
+        return triggered
+
+    # Восстановление индекса из готовых отсортированных массивов (AlertStore.load_index)
+    def load(self, indexes: Dict[IndexKey, ThresholdIndex]) -> int:
+        self._indexes = indexes
+        return len(self)
+
+    # Число подписок по парам и условиям
+    def stats(self) -> Dict[str, int]:
+        return {
+            f"{base}/{quote} {direction}": len(index)
+            for (base, quote, direction), index in self._indexes.items()
+        }
+
+
+# Хранилище подписок в SQLite (общий рабочий поток и режим WAL - SQLiteStore)
+class AlertStore(SQLiteStore):
+    schema = SCHEMA
+    thread_name = "alert_store"
+    title = "Хранилище подписок"
+
+    # Новая подписка
+    async def add_alert(
+        self,
+        user_id: int,
+        chat_id: int,
+        base: str,
+        quote: str,
+        direction: str,
+        threshold: float,
+    ) -> Alert:
+        return await self._run(
+            self._add_alert, user_id, chat_id, base, quote, direction, threshold
+        )
+
+    def _add_alert(
+        self,
+        user_id: int,
+        chat_id: int,
+        base: str,
+        quote: str,
+        direction: str,
+        threshold: float,
+    ) -> Alert:
+        created_at = time.time()
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO alerts"
+                " (user_id, chat_id, base, quote, direction, threshold, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, chat_id, base, quote, direction, threshold, created_at),
+            )
+        return Alert(
+            cursor.lastrowid, user_id, chat_id, base, quote, direction, threshold, created_at
+        )
+
+    # Подписки пользователя, старые первыми (индекс idx_alerts_user)
+    async def user_alerts(self, user_id: int) -> List[Alert]:
+        return await self._run(self._user_alerts, user_id)
+
+    def _user_alerts(self, user_id: int) -> List[Alert]:
+        rows = self._connection.execute(
+            f"SELECT {COLUMNS} FROM alerts WHERE user_id = ? ORDER BY id", (user_id,)
+        ).fetchall()
+        return [Alert(*row) for row in rows]
+
+    # Удаление подписки пользователя; None, если такой подписки у него нет
+    async def remove_alert(self, user_id: int, alert_id: int) -> Optional[Alert]:
+        return await self._run(self._remove_alert, user_id, alert_id)
+
+    def _remove_alert(self, user_id: int, alert_id: int) -> Optional[Alert]:
+        with self._connection:
+            row = self._connection.execute(
+                f"SELECT {COLUMNS} FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
+        return Alert(*row)
+
+    # Сработавшие подписки: читаются и удаляются одной транзакцией.
+    # Подписки, удалённые пользователем за это время, просто не возвращаются.
+    async def take_alerts(self, alert_ids: Iterable[int]) -> List[Alert]:
+        return await self._run(self._take_alerts, list(alert_ids))
+
+    def _take_alerts(self, alert_ids: List[int]) -> List[Alert]:
+        alerts = []
+        with self._connection:
+            for start in range(0, len(alert_ids), ID_BATCH):
+                batch = alert_ids[start : start + ID_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT {COLUMNS} FROM alerts WHERE id IN ({placeholders})", batch
+                ).fetchall()
+                self._connection.execute(f"DELETE FROM alerts WHERE id IN ({placeholders})", batch)
+                alerts.extend(Alert(*row) for row in rows)
+        return alerts
+
+    # Индекс порогов всех подписок для AlertIndex.load. Строки приходят уже
+    # отсортированными по индексу idx_alerts_pair и дописываются в массивы без сортировки.
+    async def load_index(self) -> Dict[IndexKey, ThresholdIndex]:
+        return await self._run(self._load_index)
+
+    def _load_index(self) -> Dict[IndexKey, ThresholdIndex]:
+        indexes: Dict[IndexKey, ThresholdIndex] = {}
+        index = None
+        key = None
+        rows = self._connection.execute(
+            "SELECT base, quote, direction, threshold, id FROM alerts"
+            " ORDER BY base, quote, direction, threshold, id"
+        )
+        for base, quote, direction, threshold, alert_id in rows:
+            if key != (base, quote, direction):
+                key = (base, quote, direction)
+                index = indexes[key] = ThresholdIndex(direction)
+            index.thresholds.append(threshold)
+            index.ids.append(alert_id)
+        return indexes
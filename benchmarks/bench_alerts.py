@@ -0,0 +1,117 @@
+"""Бенчмарк проверки подписок на курс (alerts.AlertIndex).
+
+Строит индекс из N случайных подписок на все пары валют бота и измеряет
+загрузку индекса из базы и проверку подписок на последовательности снимков
+курсов со случайным блужданием. Для сравнения - прямой перебор всех подписок.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_alerts --alerts 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from itertools import permutations
+from typing import Dict, List, Tuple
+
+from alerts import ABOVE, BELOW, SCHEMA, AlertIndex, AlertStore, is_triggered
+from rates import RateMatrix
+
+# Курсы относительно USD, вокруг которых блуждают снимки
+RATES = {"USD": 1.0, "RUB": 92.5, "TRY": 32.1}
+
+
+def random_matrix(rng: random.Random, rates: Dict[str, float], step: float) -> RateMatrix:
+    for code in rates:
+        if code != "USD":
+            rates[code] *= 1 + rng.uniform(-step, step)
+    return RateMatrix("USD", dict(rates))
+
+
+# Подписки вокруг текущего курса пары: ">" выше курса, "<" ниже
+def random_alerts(rng: random.Random, count: int) -> List[Tuple[str, str, str, float]]:
+    matrix = RateMatrix("USD", RATES)
+    pairs = list(permutations(RATES, 2))
+    alerts = []
+    for _ in range(count):
+        base, quote = rng.choice(pairs)
+        rate = matrix.rate(base, quote)
+        direction = rng.choice((ABOVE, BELOW))
+        spread = rng.uniform(0.0001, 0.2)
+        threshold = rate * (1 + spread) if direction == ABOVE else rate * (1 - spread)
+        alerts.append((base, quote, direction, threshold))
+    return alerts
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    alerts = random_alerts(rng, args.alerts)
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_alerts_"), "alerts.db")
+
+    started = time.perf_counter()
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany(
+            "INSERT INTO alerts"
+            " (user_id, chat_id, base, quote, direction, threshold, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, 0)",
+            ((i, i, *alert) for i, alert in enumerate(alerts)),
+        )
+    connection.close()
+    print(f"запись {args.alerts} подписок в базу: {time.perf_counter() - started:.2f} с")
+
+    store = AlertStore(path)
+    await store.open()
+
+    index = AlertIndex()
+    started = time.perf_counter()
+    index.load(await store.load_index())
+    print(f"загрузка индекса: {time.perf_counter() - started:.2f} с, {len(index)} подписок")
+
+    rates = dict(RATES)
+    snapshots = [random_matrix(rng, rates, args.step) for _ in range(args.refreshes)]
+
+    # Прямой перебор: каждая подписка на каждом снимке (только первый снимок)
+    started = time.perf_counter()
+    naive = sum(
+        1 for base, quote, direction, threshold in alerts
+        if is_triggered(direction, threshold, snapshots[0].rate(base, quote))
+    )
+    naive_ms = (time.perf_counter() - started) * 1000
+
+    timings = []
+    triggered = 0
+    for number, matrix in enumerate(snapshots):
+        started = time.perf_counter()
+        alert_ids = index.pop_triggered(matrix)
+        timings.append((time.perf_counter() - started) * 1000)
+        if number == 0 and len(alert_ids) != naive:
+            raise AssertionError(f"индекс: {len(alert_ids)}, перебор: {naive}")
+        triggered += len(alert_ids)
+
+    timings.sort()
+    print(f"перебор всех подписок, 1 снимок: {naive_ms:.1f} мс")
+    print(
+        f"индекс, {args.refreshes} снимков: медиана {timings[len(timings) // 2]:.3f} мс, "
+        f"макс. {timings[-1]:.3f} мс, сработало {triggered}, осталось {len(index)}"
+    )
+    await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки подписок на курс")
+    parser.add_argument("--alerts", type=int, default=1_000_000, help="число подписок")
+    parser.add_argument("--refreshes", type=int, default=100, help="число снимков курсов")
+    parser.add_argument(
+        "--step", type=float, default=0.01, help="макс. изменение курса за снимок (доля)"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Микробенчмарк обработчиков bot.py.
+
+Собирает Application так же, как bot.main() (bot.build_application: обработчики,
+ChatOrderedUpdateProcessor и SendScheduler), и запускает его против поддельного Bot API (в процессе, без сети) и поддельного API курсов.
+Для каждого типа обновления печатает пропускную способность, задержки p50/p99
+и пиковую память на одно обновление.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_handlers --updates 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest, RequestData
+
+import bot
+from rate_limiter import SendScheduler
+from rates import RateMatrix
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+USER = {"id": 1000, "is_bot": False, "first_name": "Пользователь", "language_code": "ru"}
+CHAT = {"id": 1000, "type": "private", "first_name": "Пользователь"}
+
+# Курсы относительно USD для поддельного API курсов
+FAKE_RATES = {"USD": 1.0, "RUB": 92.5, "TRY": 32.1, "EUR": 0.92}
+
+# Лимиты SendScheduler для бенчмарка: все обновления идут в один чат, и с лимитами
+# Telegram замерялось бы ожидание очереди, а не стоимость планировщика
+UNTHROTTLED = {
+    "global_rate": 1e9,
+    "global_burst": 1e9,
+    "private_chat_interval": 1e-9,
+    "group_chat_interval": 1e-9,
+}
+
+
+# Поддельный Bot API: отвечает на запросы без сети, но кодирует параметры в JSON,
+# как это делает настоящий HTTPXRequest, чтобы стоимость сериализации учитывалась
+class FakeBotRequest(BaseRequest):
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self._message_id = 0
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        parameters = request_data.json_parameters if request_data else {}
+        return 200, json.dumps({"ok": True, "result": self._result(api_method, parameters)}).encode()
+
+    def _result(self, api_method: str, parameters: Dict[str, str]) -> object:
+        if api_method == "getMe":
+            return BOT_USER
+        if api_method in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": CHAT,
+                "from": BOT_USER,
+                "text": parameters.get("text", ""),
+            }
+        return True
+
+
+# Поддельный клиент API курсов с настраиваемой задержкой ответа
+class FakeRateClient:
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def fetch_snapshot(
+        self, base_currency: str, previous: Optional[RateMatrix] = None
+    ) -> Optional[RateMatrix]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.time()
+        return RateMatrix(base_currency, FAKE_RATES, updated_at=now, next_update_at=now + 3600)
+
+
+# Конструкторы обновлений по типам
+def message_update(update_id: int, text: str) -> dict:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": CHAT,
+        "from": USER,
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": USER,
+            "chat_instance": "bench",
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": CHAT,
+                "from": BOT_USER,
+                "text": "Выберите базовую валюту:",
+            },
+        },
+    }
+
+
+# Сброс кэша курсов: следующее нажатие кнопки пойдёт в API курсов
+def drop_rates() -> None:
+    bot.cache.clear()
+    bot.rendered_messages.clear()
+    bot.last_snapshot = None
+
+
+# Сценарии: имя -> (конструктор обновления, действие перед каждым обновлением)
+SCENARIOS: Dict[str, Tuple[Callable[[int], dict], Optional[Callable[[], None]]]] = {
+    "start": (lambda i: message_update(i, "/start"), None),
+    "rate": (lambda i: message_update(i, "/rate"), None),
+    "history": (lambda i: message_update(i, "/history USD RUB 7d"), None),
+    "button": (
+        lambda i: callback_update(i, bot.RATE_ACTION.encode(("RUB", "USD", "TRY")[i % 3])),
+        None,
+    ),
+    "button_cold": (lambda i: callback_update(i, bot.RATE_ACTION.encode("RUB")), drop_rates),
+    # Кнопка "Старее ›" списка заявок: разбор данных кнопки и запрос страницы по курсору
+    "requests_page": (
+        lambda i: callback_update(i, bot.requests_callback_data("u", None, None, before_id=1000)),
+        None,
+    ),
+    "current_rate": (lambda i: message_update(i, "Текущий курс"), None),
+    "requests": (lambda i: message_update(i, "Заявки"), None),
+    # Диалог подачи заявки: кнопка и данные заявки по очереди, каждая вторая - запись в базу
+    "submit_request": (
+        lambda i: message_update(i, ("Подать заявку", "купить 100 USD RUB 95.5")[i % 2]),
+        None,
+    ),
+    # Подписка на курс и список подписок по очереди
+    "alert": (lambda i: message_update(i, ("/alert USD RUB > 1000", "/alert")[i % 2]), None),
+    "echo": (lambda i: message_update(i, "Привет, бот!"), None),
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+# Обработка обновления тем же путём, что и при получении от Telegram:
+# через процессор обновлений приложения
+async def dispatch(application: Application, update: Update) -> None:
+    await application.update_processor.process_update(update, application.process_update(update))
+
+
+# Прогон одного сценария: задержки каждого обновления и пиковая память
+async def run_scenario(
+    application: Application, name: str, updates: int, update_id: int
+) -> Dict[str, float]:
+    build, prepare = SCENARIOS[name]
+    payloads = [build(update_id + i) for i in range(updates)]
+
+    latencies = []
+    started = time.perf_counter()
+    for payload in payloads:
+        if prepare is not None:
+            prepare()
+        update = Update.de_json(payload, application.bot)
+        begin = time.perf_counter()
+        await dispatch(application, update)
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+
+    # Память измеряется отдельным прогоном: tracemalloc сильно замедляет обработку
+    sample = payloads[: max(1, updates // 10)]
+    tracemalloc.start()
+    peaks = []
+    for payload in sample:
+        if prepare is not None:
+            prepare()
+        update = Update.de_json(payload, application.bot)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await dispatch(application, update)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "updates_per_sec": updates / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "alloc_kib": statistics.fmean(peaks) / 1024,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    # Снимок, история курсов и база заявок пишутся во временный каталог
+    with tempfile.TemporaryDirectory(prefix="bench_handlers_") as workdir:
+        return await run_in(args, workdir)
+
+
+async def run_in(args: argparse.Namespace, workdir: str) -> Dict[str, Dict[str, float]]:
+    os.environ["RATES_SNAPSHOT_PATH"] = os.path.join(workdir, "rates_snapshot.bin")
+    bot.request_store.path = os.path.join(workdir, "requests.db")
+    await bot.request_store.open()
+    bot.alert_store.path = os.path.join(workdir, "alerts.db")
+    await bot.alert_store.open()
+    bot.rate_history.directory = os.path.join(workdir, "rates_history")
+    bot.rate_history.load()
+    bot.rate_client = FakeRateClient(latency=args.rate_latency / 1000)
+
+    application = bot.build_application(
+        Application.builder()
+        .token("123456:BENCH")
+        .request(FakeBotRequest())
+        .get_updates_request(FakeBotRequest())
+        .updater(None),
+        scheduler=SendScheduler(**UNTHROTTLED),
+    )
+    # Запуск без Updater: работают JobQueue (таймаут диалога заявки) и процессор обновлений
+    await application.initialize()
+    await application.start()
+
+    # Прогрев: снимок курсов в кэше и одна строка истории
+    await bot.get_rate_matrix()
+
+    results = {}
+    names = args.scenarios or list(SCENARIOS)
+    try:
+        for index, name in enumerate(names):
+            results[name] = await run_scenario(
+                application, name, args.updates, update_id=(index + 1) * 10 * args.updates
+            )
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await bot.request_store.close()
+        await bot.alert_store.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк обработчиков bot.py")
+    parser.add_argument("--updates", type=int, default=1000, help="обновлений на сценарий")
+    parser.add_argument(
+        "--rate-latency", type=float, default=0.0, help="задержка API курсов, мс"
+    )
+    parser.add_argument(
+        "--scenario", dest="scenarios", action="append", choices=list(SCENARIOS),
+        help="запустить только указанные сценарии (можно повторять)",
+    )
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'сценарий':<16}{'обн/с':>10}{'p50, мс':>10}{'p99, мс':>10}{'память, КиБ':>14}")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['updates_per_sec']:>10.0f}{result['p50_ms']:>10.3f}"
+            f"{result['p99_ms']:>10.3f}{result['alloc_kib']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
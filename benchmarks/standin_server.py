@@ -0,0 +1,300 @@
+"""Локальная замена Telegram Bot API и API курсов для нагрузочного тестирования.
+
+Реализует методы Bot API getMe, getUpdates, setWebhook, deleteWebhook,
+sendMessage, editMessageText и answerCallbackQuery (остальные методы отвечают
+true) и эндпоинт курсов /v6/latest/{base} в формате open.er-api.com.
+Задержка ответа, доля ошибок 500 и ответов 429 с retry_after настраиваются.
+
+Запуск:
+    python -m benchmarks.standin_server --port 8081 --latency-ms 50 --flood-rate 0.01
+
+Подключение бота и примеров:
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot RATES_API_URL=http://127.0.0.1:8081 python bot.py
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import signal
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import bot
+
+logger = logging.getLogger(__name__)
+
+BOT_METHOD_PATTERN = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+RATES_PATTERN = re.compile(r"^/v6/latest/(?P<base>[A-Za-z]{3})$")
+
+# Курсы относительно USD, от которых считаются остальные базы
+BASE_RATES = {"USD": 1.0, "RUB": 92.5, "TRY": 32.1, "EUR": 0.92, "GBP": 0.79, "CNY": 7.24}
+
+TEXTS = ("Привет", "Текущий курс", "Заявки", "Подать заявку", "/start", "/rate")
+
+# Данные нажатий кнопок: выбор валюты и страницы заявок в формате callback_codec,
+# а также коды валют из клавиатур, отправленных до перехода на callback_codec
+CALLBACK_DATA = (
+    *(bot.RATE_ACTION.encode(code) for code in bot.CURRENCIES),
+    bot.requests_callback_data("u", None, None),
+    bot.requests_callback_data("u", bot.STATUS_OPEN, "USD"),
+    bot.requests_callback_data("u", None, None, before_id=1000),
+    *bot.CURRENCIES,
+)
+
+
+# Состояние сервера, общее для всех потоков обработки
+class StandInState:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency = args.latency_ms / 1000
+        self.jitter = args.jitter_ms / 1000
+        self.error_rate = args.error_rate
+        self.flood_rate = args.flood_rate
+        self.retry_after = args.retry_after
+        self.updates_per_poll = args.updates_per_poll
+        self.chats = args.chats
+        self.rates_period = args.rates_period
+        self.webhook_url = ""
+        self.lock = threading.Lock()
+        self.update_id = 0
+        self.message_id = 0
+        self.calls: Dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def next_message_id(self) -> int:
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+    # Синтетические обновления для getUpdates: текст или нажатие кнопки из случайного чата
+    def make_updates(self) -> List[dict]:
+        updates = []
+        for _ in range(self.updates_per_poll):
+            with self.lock:
+                self.update_id += 1
+                update_id = self.update_id
+            chat_id = random.randint(1, self.chats)
+            user = {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+            chat = {"id": chat_id, "type": "private", "first_name": user["first_name"]}
+            if random.random() < 0.2:
+                updates.append(
+                    {
+                        "update_id": update_id,
+                        "callback_query": {
+                            "id": str(update_id),
+                            "from": user,
+                            "chat_instance": str(chat_id),
+                            "data": random.choice(CALLBACK_DATA),
+                            "message": self.message(chat, "Выберите базовую валюту:"),
+                        },
+                    }
+                )
+                continue
+            text = random.choice(TEXTS)
+            message = self.message(chat, text, sender=user)
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+            updates.append({"update_id": update_id, "message": message})
+        return updates
+
+    def message(self, chat: dict, text: str, sender: Optional[dict] = None) -> dict:
+        return {
+            "message_id": self.next_message_id(),
+            "date": int(time.time()),
+            "chat": chat,
+            "from": sender or {"id": 1, "is_bot": True, "first_name": "StandIn"},
+            "text": text,
+        }
+
+    # Документ курсов; время обновления меняется раз в rates_period секунд
+    def rates_document(self, base: str) -> Tuple[dict, str]:
+        now = int(time.time())
+        updated = now - now % self.rates_period
+        factor = 1.0 / BASE_RATES[base]
+        document = {
+            "result": "success",
+            "base_code": base,
+            "time_last_update_unix": updated,
+            "time_next_update_unix": updated + self.rates_period,
+            "rates": {code: rate * factor for code, rate in BASE_RATES.items()},
+        }
+        return document, f'"{base}-{updated}"'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = "StandIn/1.0"
+    # keep-alive, как у настоящего API: все ответы отправляются с Content-Length
+    protocol_version = "HTTP/1.1"
+    state: StandInState
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        logger.debug(format, *args)
+
+    def do_GET(self) -> None:
+        self.handle_request()
+
+    def do_POST(self) -> None:
+        self.handle_request()
+
+    def handle_request(self) -> None:
+        path = urlsplit(self.path).path
+        state = self.state
+        # Тело читается сразу, даже для ответа с ошибкой, иначе соединение keep-alive сломается
+        parameters = self.read_parameters()
+        time.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+
+        bot_match = BOT_METHOD_PATTERN.match(path)
+        rates_match = RATES_PATTERN.match(path)
+        if bot_match is None and rates_match is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {"ok": False, "description": "Not Found"})
+            return
+
+        # Внедрение ошибок: 429 с retry_after и 500
+        roll = random.random()
+        if roll < state.flood_rate:
+            state.count("429")
+            self.send_json(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {state.retry_after}",
+                    "parameters": {"retry_after": state.retry_after},
+                },
+            )
+            return
+        if roll < state.flood_rate + state.error_rate:
+            state.count("500")
+            self.send_json(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"},
+            )
+            return
+
+        if rates_match is not None:
+            self.handle_rates(rates_match.group("base").upper())
+        else:
+            self.handle_bot_method(bot_match.group("method"), parameters)
+
+    def handle_rates(self, base: str) -> None:
+        self.state.count("rates")
+        if base not in BASE_RATES:
+            self.send_json(HTTPStatus.OK, {"result": "error", "error-type": "unsupported-code"})
+            return
+        document, etag = self.state.rates_document(base)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(HTTPStatus.OK, document, headers={"ETag": etag})
+
+    def handle_bot_method(self, method: str, parameters: Dict[str, object]) -> None:
+        state = self.state
+        state.count(method)
+
+        if method == "getMe":
+            result: object = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "StandIn",
+                "username": "standin_bot",
+                "can_join_groups": True,
+                "can_read_all_group_messages": False,
+                "supports_inline_queries": False,
+            }
+        elif method == "getUpdates":
+            result = [] if state.webhook_url else state.make_updates()
+            if not result:
+                time.sleep(min(float(parameters.get("timeout", 0) or 0), 1.0))
+        elif method == "setWebhook":
+            state.webhook_url = str(parameters.get("url", ""))
+            result = True
+        elif method == "deleteWebhook":
+            state.webhook_url = ""
+            result = True
+        elif method == "getWebhookInfo":
+            result = {
+                "url": state.webhook_url,
+                "has_custom_certificate": False,
+                "pending_update_count": 0,
+            }
+        elif method in ("sendMessage", "editMessageText"):
+            chat_id = int(parameters.get("chat_id", 0) or 0)
+            result = state.message(
+                {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"},
+                str(parameters.get("text", "")),
+            )
+        else:
+            # answerCallbackQuery и прочие методы
+            result = True
+        self.send_json(HTTPStatus.OK, {"ok": True, "result": result})
+
+    # Параметры запроса: form-urlencoded (так отправляет PTB), JSON или строка запроса
+    def read_parameters(self) -> Dict[str, object]:
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json") and body:
+            return json.loads(body)
+        source = body.decode("utf-8") if body else urlsplit(self.path).query
+        return {key: values[-1] for key, values in parse_qs(source).items()}
+
+    def send_json(
+        self, status: HTTPStatus, payload: dict, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная замена Bot API и API курсов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка ответа, мс")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="разброс задержки, мс")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429, с")
+    parser.add_argument(
+        "--updates-per-poll", type=int, default=0, help="синтетических обновлений на getUpdates"
+    )
+    parser.add_argument("--chats", type=int, default=100, help="число синтетических чатов")
+    parser.add_argument(
+        "--rates-period", type=int, default=3600, help="период обновления курсов, с"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+    )
+    StandInHandler.state = StandInState(args)
+    # SIGTERM завершает сервер так же, как Ctrl-C, с выводом статистики вызовов
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    logger.info("Сервер запущен на http://%s:%s", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Вызовы: %s", StandInHandler.state.calls)
+
+
+if __name__ == "__main__":
+    main()
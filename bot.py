@@ -1,10 +1,44 @@
+import asyncio
 import logging
 import os
-import requests
-from cachetools import TTLCache
+import re
+import secrets
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, CallbackQueryHandler, filters
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram.error import TelegramError
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
+
+from alerts import ABOVE, BELOW, Alert, AlertIndex, AlertStore, is_triggered
+from caching import InstrumentedCache
+from callback_codec import CallbackCodec, Enum, UInt
+from keyboards import KeyboardRegistry
+from order_book import Fill, OrderBooks, canonical_order
+from rate_history import RateHistory, parse_period
+from rate_limiter import PRIORITY_LOW, SendScheduler
+from rates import (
+    DEFAULT_TTL,
+    RATES_API_URL,
+    SNAPSHOT_BASE,
+    RateClient,
+    RateMatrix,
+    SingleFlight,
+    load_snapshot,
+    save_snapshot,
+)
+from request_store import (
+    SIDE_BUY,
+    SIDE_SELL,
+    STATUS_CANCELLED,
+    STATUS_FILLED,
+    STATUS_OPEN,
+    ExchangeRequest,
+    RequestPage,
+    RequestStore,
+)
+from routing import CallbackActionHandler, ExactTextHandler
+from update_processor import ChatOrderedUpdateProcessor
 
 # Логирование
 logging.basicConfig(
@@ -13,32 +47,349 @@ logging.basicConfig(
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-# Настройка кэша (максимум 10 записей, время жизни 5 часов = 18000 секунд)
-cache = TTLCache(maxsize=10, ttl=18000)
+# Фоновое обновление курсов через минуту после объявленного API обновления
+RATES_REFRESH_DELAY = 60
+
+# Повтор обновления через 5 минут, если API недоступно
+RATES_RETRY_INTERVAL = 300
+
+# Бюджет памяти кэша курсов: 1 МБ
+CACHE_MAX_BYTES = 1024 * 1024
+
+# Настройка кэша: ограничен объёмом памяти, а не числом записей.
+# Время жизни каждой записи задаёт расписание обновлений API, а не фиксированный TTL.
+cache = InstrumentedCache(ttl=DEFAULT_TTL, max_bytes=CACHE_MAX_BYTES)
+
+# Адрес Bot API по умолчанию
+TELEGRAM_API_URL = "https://api.telegram.org/bot"
+
+# Сколько обновлений обрабатывается одновременно (разные чаты; один чат - по порядку)
+DEFAULT_CONCURRENT_UPDATES = 32
+
+# Путь, на котором бот принимает обновления в режиме вебхука
+WEBHOOK_PATH = "telegram"
+
+# Порт вебхука по умолчанию (Railway передаёт свой порт в переменной PORT)
+DEFAULT_WEBHOOK_PORT = 8443
+
+# Файл снимка курсов по умолчанию: переживает перезапуск процесса
+DEFAULT_SNAPSHOT_PATH = "rates_snapshot.bin"
+
+# Каталог истории курсов по умолчанию
+DEFAULT_HISTORY_DIR = "rates_history"
+
+# База заявок по умолчанию
+DEFAULT_REQUESTS_DB_PATH = "requests.db"
+
+# База подписок на курс по умолчанию
+DEFAULT_ALERTS_DB_PATH = "alerts.db"
+
+# Последний удачный снимок курсов: отдаётся, пока обновление не готово или API недоступно
+last_snapshot: Optional[RateMatrix] = None
+
+# Валюты, которые предлагает бот
+CURRENCIES = ("RUB", "USD", "TRY")
+
+# Названия валют для кнопок
+CURRENCY_NAMES = {"RUB": "Рубль", "USD": "Доллар", "TRY": "Лира"}
+
+# История курсов предлагаемых валют: загружается в post_init
+rate_history = RateHistory(DEFAULT_HISTORY_DIR, CURRENCIES)
+
+# Шаблоны сообщения с курсами по языку пользователя; язык по умолчанию - первый
+RATE_TEMPLATES = {
+    "ru": {
+        "title": "Курс валют относительно {base}:",
+        "line": "1 {base} = {rate} {quote}",
+        "unknown": "неизвестно",
+    },
+}
+
+# Кэш готовых сообщений с курсами: ключ (базовая валюта, версия снимка, язык)
+rendered_messages = InstrumentedCache(ttl=DEFAULT_TTL, maxsize=len(CURRENCIES) * 4)
+
+# Хранилище заявок: открывается в post_init
+request_store = RequestStore(DEFAULT_REQUESTS_DB_PATH)
+
+# Книги открытых заявок по валютным парам: восстанавливаются из базы в post_init
+order_books = OrderBooks()
+
+# Подписки на курс: хранятся в базе, пороги - в индексе в памяти (загружается в post_init)
+alert_store = AlertStore(DEFAULT_ALERTS_DB_PATH)
+alert_index = AlertIndex()
+
+# Сколько подписок может быть у одного пользователя
+MAX_ALERTS_PER_USER = 20
+
+# Сколько уведомлений о сработавших подписках отправлять одновременно
+# (темп отправки всё равно задаёт SendScheduler)
+ALERT_SEND_BATCH = 100
+
+# Формат подписки: "/alert USD RUB > 95" - уведомить, когда 1 USD дороже 95 RUB
+ALERT_PATTERN = re.compile(
+    r"^(?P<base>[a-z]{3})\s+(?P<quote>[a-z]{3})\s*(?P<direction>[<>])\s*"
+    r"(?P<threshold>\d+(?:[.,]\d+)?)$",
+    re.IGNORECASE,
+)
+
+# Подписи условий подписки
+DIRECTION_NAMES = {ABOVE: "выше", BELOW: "ниже"}
+
+# Состояние диалога подачи заявки: ждём данные заявки
+ENTERING_REQUEST = 0
+
+# Диалог подачи заявки завершается сам, если данные не введены за 5 минут
+REQUEST_CONVERSATION_TIMEOUT = 300
+
+# Сколько заявок показывать на странице списка "Заявки"
+REQUESTS_PAGE_SIZE = 10
+
+# Данные inline-кнопок: номер действия и поля в двоичном виде (см. callback_codec).
+# Номера действий и порядок значений в Enum не меняются, пока в чатах есть старые кнопки
+callback_codec = CallbackCodec()
+
+# Выбор базовой валюты на клавиатуре курсов
+RATE_ACTION = callback_codec.action(1, "rate", Enum(*CURRENCIES))
+
+# Кнопки списка заявок: u - свои, a - все; статус и валюта (None - все);
+# курсор: before_id - заявки старше id, after_id - новее id (0 - первая страница)
+REQUESTS_ACTION = callback_codec.action(
+    2,
+    "requests",
+    Enum("u", "a"),
+    Enum(None, STATUS_OPEN, STATUS_FILLED, STATUS_CANCELLED),
+    Enum(None, *CURRENCIES),
+    UInt(),
+    UInt(),
+)
+
+# Фильтры статуса и их подписи
+STATUS_FILTER_LABELS = (
+    (None, "Все"),
+    (STATUS_OPEN, "Открытые"),
+    (STATUS_FILLED, "Исполненные"),
+    (STATUS_CANCELLED, "Отменённые"),
+)
+
+# Готовые первые страницы списка заявок. В ключе - версия заявок владельца:
+# новая заявка или сделка меняет версию, и старые страницы больше не находятся
+REQUEST_PAGES_TTL = 300
+request_pages = InstrumentedCache(ttl=REQUEST_PAGES_TTL, maxsize=1000)
+request_versions: Dict[Optional[int], int] = {}
+
+# Формат заявки: "купить 100 USD RUB 95.5" - купить 100 USD по 95.5 RUB за 1 USD
+REQUEST_PATTERN = re.compile(
+    r"^(?P<side>купить|продать|buy|sell)\s+(?P<amount>\d+(?:[.,]\d+)?)\s+"
+    r"(?P<base>[a-z]{3})\s+(?:за\s+)?(?P<quote>[a-z]{3})\s+(?:по\s+)?(?P<price>\d+(?:[.,]\d+)?)$",
+    re.IGNORECASE,
+)
+
+# Сторона заявки по введённому слову
+REQUEST_SIDES = {"купить": SIDE_BUY, "buy": SIDE_BUY, "продать": SIDE_SELL, "sell": SIDE_SELL}
+
+# Подписи сторон и статусов заявки
+SIDE_NAMES = {SIDE_BUY: "Покупка", SIDE_SELL: "Продажа"}
+STATUS_NAMES = {"open": "открыта", "filled": "исполнена", "cancelled": "отменена"}
+
+# Клиент API курсов валют с общим пулом соединений
+rate_client = RateClient()
+
+# Один запрос к API за снимком курсов, сколько бы пользователей ни ждали курс
+rate_requests = SingleFlight()
+
+# Статические клавиатуры: строятся и сериализуются один раз при запуске
+keyboards = KeyboardRegistry()
 
 # Постоянная клавиатура с кнопками
-def get_main_keyboard():
-    keyboard = [
-        ["Текущий курс", "Заявки"],
-        ["Подать заявку"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+keyboards.register(
+    "main",
+    ReplyKeyboardMarkup(
+        [
+            ["Текущий курс", "Заявки"],
+            ["Подать заявку"]
+        ],
+        resize_keyboard=True,
+    ),
+)
+
+# Клавиатура выбора базовой валюты
+keyboards.register(
+    "rates",
+    InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    f"{CURRENCY_NAMES[code]} ({code})", callback_data=RATE_ACTION.encode(code)
+                )
+                for code in CURRENCIES
+            ]
+        ]
+    ),
+)
 
-# Функция для получения курса валюты с использованием кэша
-def get_exchange_rate(base_currency: str) -> dict:
-    if base_currency in cache:
-        return cache[base_currency]
+# Постоянная клавиатура (готовый JSON для reply_markup)
+def get_main_keyboard() -> str:
+    return keyboards["main"]
 
+# Клавиатура выбора базовой валюты (готовый JSON для reply_markup)
+def get_rate_keyboard() -> str:
+    return keyboards["rates"]
+
+# Функция для получения матрицы курсов с использованием кэша.
+# Один снимок относительно SNAPSHOT_BASE покрывает все пары валют.
+# Если снимок устарел, отдаётся последний удачный: свежий подгружает refresh_rates.
+async def get_rate_matrix() -> Optional[RateMatrix]:
+    matrix = cache.get(SNAPSHOT_BASE)
+    if matrix is not None:
+        return matrix
+    if last_snapshot is not None:
+        return last_snapshot
+
+    # Снимка ещё нет (первый запуск): ждём ответ API
+    return await rate_requests.do(SNAPSHOT_BASE, fetch_rate_matrix)
+
+# Запрос снимка курсов к API с сохранением результата в кэш
+async def fetch_rate_matrix() -> Optional[RateMatrix]:
+    global last_snapshot
+
+    matrix = await rate_client.fetch_snapshot(SNAPSHOT_BASE, previous=last_snapshot)
+    if matrix is None:
+        return None
+    cache.set(SNAPSHOT_BASE, matrix, expires_at=matrix.expires_at)  # Обновляем кэш снимка
+    last_snapshot = matrix
+
+    # Сохраняем снимок на диск в отдельном потоке, чтобы не блокировать цикл событий
     try:
-        response = requests.get(f"https://open.er-api.com/v6/latest/{base_currency}")
-        data = response.json()
-        if data["result"] == "success":
-            cache[base_currency] = data["rates"]  # Обновляем кэш для выбранной валюты
-            return cache[base_currency]
-        else:
-            return {}
-    except Exception as e:
-        return {}
+        await asyncio.to_thread(save_snapshot, matrix, get_snapshot_path())
+    except OSError as e:
+        logger.warning("Не удалось сохранить снимок курсов: %s", e)
+
+    # Новый снимок дописываем в историю курсов
+    row = rate_history.append(matrix)
+    if row is not None:
+        try:
+            await asyncio.to_thread(rate_history.write, *row)
+        except OSError as e:
+            logger.warning("Не удалось записать историю курсов: %s", e)
+    return matrix
+
+# Путь к файлу снимка курсов (переменная окружения RATES_SNAPSHOT_PATH)
+def get_snapshot_path() -> str:
+    return os.getenv("RATES_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+# Загрузка снимка с диска при запуске: пользователи сразу получают курсы,
+# не дожидаясь ответа API
+def restore_snapshot() -> None:
+    global last_snapshot
+
+    matrix = load_snapshot(get_snapshot_path())
+    if matrix is None or matrix.base != SNAPSHOT_BASE:
+        return
+    last_snapshot = matrix
+    if not matrix.is_expired:
+        cache.set(SNAPSHOT_BASE, matrix, expires_at=matrix.expires_at)
+    logger.info("Загружен снимок курсов возрастом %s", format_age(matrix.age))
+
+# Фоновое обновление курсов из JobQueue.
+# Следующий запуск планируется на момент, когда у API появятся новые данные.
+# При ошибке пользователи получают последний удачный снимок, а обновление повторяется;
+# запуск планируется в finally, чтобы непредвиденное исключение (его запишет JobQueue)
+# не оборвало цепочку обновлений навсегда.
+async def refresh_rates(context: ContextTypes.DEFAULT_TYPE) -> None:
+    delay = RATES_RETRY_INTERVAL
+    try:
+        matrix = await rate_requests.do(SNAPSHOT_BASE, fetch_rate_matrix)
+        if matrix is None:
+            logger.warning(
+                "Не удалось обновить курсы, повтор через %s секунд", RATES_RETRY_INTERVAL
+            )
+            return
+
+        delay = max(matrix.expires_at - time.time(), 0) + RATES_REFRESH_DELAY
+        await check_alerts(context.application, matrix)
+    finally:
+        context.job_queue.run_once(refresh_rates, delay)
+
+# Проверка подписок на новом снимке курсов: сработавшие находятся двоичным поиском
+# по порогам каждой пары, удаляются из базы, а уведомления уходят в фоне
+async def check_alerts(application: Application, matrix: RateMatrix) -> None:
+    started = time.perf_counter()
+    alert_ids = alert_index.pop_triggered(matrix)
+    if not alert_ids:
+        return
+    alerts = await alert_store.take_alerts(alert_ids)
+    logger.info(
+        "Сработало подписок на курс: %d за %.1f мс",
+        len(alerts),
+        (time.perf_counter() - started) * 1000,
+    )
+    application.create_task(notify_alerts(application.bot, alerts, matrix))
+
+# Уведомления о сработавших подписках: одно сообщение на чат, с низким приоритетом
+async def notify_alerts(bot: Bot, alerts: List[Alert], matrix: RateMatrix) -> None:
+    lines: Dict[int, List[str]] = {}
+    for alert in alerts:
+        lines.setdefault(alert.chat_id, []).append(
+            f"1 {alert.base} = {format_rate(matrix.rate(alert.base, alert.quote))} {alert.quote} "
+            f"({DIRECTION_NAMES[alert.direction]} {format_rate(alert.threshold)})"
+        )
+
+    async def send(chat_id: int, chat_lines: List[str]) -> None:
+        text = "Сработали подписки на курс:\n" + "\n".join(chat_lines)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, rate_limit_args=PRIORITY_LOW)
+        except TelegramError as exc:
+            logger.warning("Не удалось отправить уведомление о курсе в чат %s: %s", chat_id, exc)
+
+    chats = list(lines.items())
+    for start in range(0, len(chats), ALERT_SEND_BATCH):
+        batch = chats[start : start + ALERT_SEND_BATCH]
+        await asyncio.gather(*(send(chat_id, chat_lines) for chat_id, chat_lines in batch))
+
+# Форматирование курса: 6 значащих цифр или "неизвестно"
+def format_rate(rate: Optional[float]) -> str:
+    if rate is None:
+        return "неизвестно"
+    return f"{rate:.6g}"
+
+# Форматирование возраста снимка: минуты или часы
+def format_age(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин."
+    return f"{minutes // 60} ч. {minutes % 60} мин."
+
+# Язык сообщения: язык пользователя, если для него есть шаблон, иначе язык по умолчанию
+def get_locale(update: Update) -> str:
+    user = update.effective_user
+    language = (user.language_code or "")[:2] if user else ""
+    return language if language in RATE_TEMPLATES else next(iter(RATE_TEMPLATES))
+
+# Сообщение с курсами относительно base_currency.
+# Готовый текст кэшируется по версии снимка: повторные нажатия не форматируют его заново.
+def render_rate_message(matrix: RateMatrix, base_currency: str, locale: str) -> str:
+    key = (base_currency, matrix.version, locale)
+    message = rendered_messages.get(key)
+    if message is not None:
+        return message
+
+    template = RATE_TEMPLATES[locale]
+    rates = matrix.row(base_currency, CURRENCIES)
+    lines = [template["title"].format(base=base_currency)]
+    for code in CURRENCIES:
+        rate = rates.get(code)
+        lines.append(
+            template["line"].format(
+                base=base_currency,
+                rate=template["unknown"] if rate is None else format_rate(rate),
+                quote=code,
+            )
+        )
+    # Telegram обрезает пробелы в конце текста, поэтому без завершающего перевода строки:
+    # иначе текст не совпадёт с уже показанным сообщением
+    message = "\n".join(lines)
+    rendered_messages.set(key, message, expires_at=matrix.expires_at)
+    return message
 
 # Обработчик команды /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -52,55 +403,568 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 async def current_rate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text("Выберите базовую валюту для курсов:", reply_markup=get_main_keyboard())
 
-# Обработчик для кнопки "Заявки"
+# Строка заявки для списка
+def format_request(request: ExchangeRequest) -> str:
+    return (
+        f"#{request.id} {SIDE_NAMES[request.side]} {format_rate(request.amount)} {request.base} "
+        f"по {format_rate(request.price)} {request.quote} - "
+        f"{STATUS_NAMES.get(request.status, request.status)}"
+    )
+
+# Заявки пользователей изменились: первые страницы их списков (и общего списка) устарели
+def touch_requests(user_ids: Iterable[int]) -> None:
+    for owner in (*user_ids, None):
+        request_versions[owner] = request_versions.get(owner, 0) + 1
+
+def requests_callback_data(
+    scope: str,
+    status: Optional[str],
+    currency: Optional[str],
+    before_id: int = 0,
+    after_id: int = 0,
+) -> str:
+    return REQUESTS_ACTION.encode(scope, status, currency, before_id, after_id)
+
+# Текст страницы заявок и кнопки фильтров и навигации
+def render_requests_page(
+    page: RequestPage, scope: str, status: Optional[str], currency: Optional[str]
+) -> Tuple[str, InlineKeyboardMarkup]:
+    title = "Все заявки" if scope == "a" else "Ваши заявки"
+    if page.requests:
+        text = f"{title}:\n" + "\n".join(format_request(request) for request in page.requests)
+    else:
+        text = f"{title}: заявок нет."
+
+    def mark(label: str, selected: bool) -> str:
+        return f"• {label}" if selected else label
+
+    status_row = [
+        InlineKeyboardButton(
+            mark(label, code == status), callback_data=requests_callback_data(scope, code, currency)
+        )
+        for code, label in STATUS_FILTER_LABELS
+    ]
+    currency_row = [
+        InlineKeyboardButton(
+            mark(label, code == currency), callback_data=requests_callback_data(scope, status, code)
+        )
+        for code, label in ((None, "Все валюты"), *((code, code) for code in CURRENCIES))
+    ]
+    keyboard = [status_row[:2], status_row[2:], currency_row]
+    navigation = []
+    if page.has_newer and page.requests:
+        navigation.append(
+            InlineKeyboardButton(
+                "‹ Новее",
+                callback_data=requests_callback_data(
+                    scope, status, currency, after_id=page.requests[0].id
+                ),
+            )
+        )
+    if page.has_older and page.requests:
+        navigation.append(
+            InlineKeyboardButton(
+                "Старее ›",
+                callback_data=requests_callback_data(
+                    scope, status, currency, before_id=page.requests[-1].id
+                ),
+            )
+        )
+    if navigation:
+        keyboard.append(navigation)
+    return text, InlineKeyboardMarkup(keyboard)
+
+# Страница заявок: первые страницы берутся из кэша, остальные - запросом по курсору
+async def get_requests_page(
+    scope: str,
+    user_id: int,
+    status: Optional[str] = None,
+    currency: Optional[str] = None,
+    before_id: int = 0,
+    after_id: int = 0,
+) -> Tuple[str, InlineKeyboardMarkup]:
+    owner = None if scope == "a" else user_id
+    key = None
+    if not before_id and not after_id:
+        key = (owner, request_versions.get(owner, 0), status, currency)
+        rendered = request_pages.get(key)
+        if rendered is not None:
+            return rendered
+
+    page = await request_store.page_requests(
+        user_id=owner,
+        status=status,
+        currency=currency,
+        before_id=before_id or None,
+        after_id=after_id or None,
+        limit=REQUESTS_PAGE_SIZE,
+    )
+    rendered = render_requests_page(page, scope, status, currency)
+    if key is not None:
+        request_pages[key] = rendered
+    return rendered
+
+# Обработчик для кнопки "Заявки": первая страница заявок пользователя
 async def requests(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.message.reply_text("Список заявок", reply_markup=get_main_keyboard())
+    text, markup = await get_requests_page("u", update.effective_user.id)
+    await update.message.reply_text(text, reply_markup=markup)
+
+# Обработчик команды /all_requests: заявки всех пользователей (только для администраторов)
+async def all_requests(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    text, markup = await get_requests_page("a", update.effective_user.id)
+    await update.message.reply_text(text, reply_markup=markup)
+
+# Обработчик кнопок списка заявок: фильтры и переход между страницами
+async def requests_page(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    scope: str,
+    status: Optional[str],
+    currency: Optional[str],
+    before_id: int,
+    after_id: int,
+) -> None:
+    query = update.callback_query
+    # Общий список доступен только администраторам, данные кнопки не проверяют права
+    if scope == "a" and query.from_user.id not in get_admin_ids():
+        await query.answer("Список недоступен")
+        return
+    await query.answer()
+
+    text, markup = await get_requests_page(
+        scope, query.from_user.id, status, currency, before_id, after_id
+    )
+    # Та же страница (повторное нажатие): редактирование вернуло бы ошибку, пропускаем
+    message = query.message
+    if message is not None and message.text == text and message.reply_markup == markup:
+        return
+    await query.edit_message_text(text=text, reply_markup=markup)
+
+# Обработчик для кнопки "Подать заявку": начало диалога
+async def submit_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text(
+        "Введите данные для заявки в формате:\n"
+        "купить 100 USD RUB 95.5\n"
+        "(купить или продать, сумма, валюта, валюта оплаты, цена)\n"
+        "Для отмены отправьте /cancel",
+        reply_markup=get_main_keyboard(),
+    )
+    return ENTERING_REQUEST
+
+# Обработчик данных заявки: сохраняет заявку или просит ввести её ещё раз
+async def receive_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    match = REQUEST_PATTERN.match(update.message.text.strip())
+    if match is None:
+        await update.message.reply_text(
+            "Не удалось разобрать заявку. Пример: купить 100 USD RUB 95.5\n"
+            "Для отмены отправьте /cancel"
+        )
+        return ENTERING_REQUEST
+
+    base_currency, quote_currency = match["base"].upper(), match["quote"].upper()
+    if base_currency == quote_currency or not {base_currency, quote_currency} <= set(CURRENCIES):
+        await update.message.reply_text(
+            f"Доступные валюты: {', '.join(CURRENCIES)}, и они должны различаться."
+        )
+        return ENTERING_REQUEST
+
+    amount = float(match["amount"].replace(",", "."))
+    price = float(match["price"].replace(",", "."))
+    if amount <= 0 or price <= 0:
+        await update.message.reply_text("Сумма и цена должны быть больше нуля.")
+        return ENTERING_REQUEST
+
+    # Пара в обратном направлении (RUB USD вместо USD RUB) записывается как встречная
+    # заявка основного направления, чтобы попасть в ту же книгу
+    side, base, quote, amount, price = canonical_order(
+        REQUEST_SIDES[match["side"].lower()], base_currency, quote_currency, amount, price,
+        CURRENCIES,
+    )
+    request = await request_store.add_request(
+        user_id=update.effective_user.id,
+        chat_id=update.effective_chat.id,
+        side=side,
+        base=base,
+        quote=quote,
+        amount=amount,
+        price=price,
+    )
+    touch_requests((request.user_id,))
+    note = "" if base == base_currency else f" (записана как пара {base}/{quote})"
+    await update.message.reply_text(
+        f"Заявка принята{note}:\n{format_request(request)}", reply_markup=get_main_keyboard()
+    )
+
+    # Сопоставление со встречными заявками: книга меняется без ожиданий между шагами,
+    # поэтому параллельные заявки из разных чатов не видят её промежуточного состояния
+    fills = order_books.match(request)
+    if fills:
+        await request_store.record_fills(fills)
+        touch_requests({fill.buy.user_id for fill in fills} | {fill.sell.user_id for fill in fills})
+        await notify_fills(context.bot, fills)
+    return ConversationHandler.END
+
+# Уведомления о сделках: одно сообщение каждому участнику на каждую его заявку
+async def notify_fills(bot: Bot, fills: List[Fill]) -> None:
+    lines: Dict[int, List[str]] = {}
+    requests_by_id: Dict[int, ExchangeRequest] = {}
+    for fill in fills:
+        for request in (fill.buy, fill.sell):
+            requests_by_id[request.id] = request
+            verb = "куплено" if request.side == SIDE_BUY else "продано"
+            lines.setdefault(request.id, []).append(
+                f"{verb} {format_rate(fill.amount)} {request.base} "
+                f"по {format_rate(fill.price)} {request.quote}"
+            )
+
+    for request_id, request_lines in lines.items():
+        request = requests_by_id[request_id]
+        state = "исполнена" if request.status == STATUS_FILLED else "исполнена частично"
+        text = f"Заявка #{request_id} {state}:\n" + "\n".join(request_lines)
+        try:
+            await bot.send_message(chat_id=request.chat_id, text=text)
+        except TelegramError as exc:
+            logger.warning("Не удалось уведомить о сделке по заявке #%s: %s", request_id, exc)
+
+# Обработчик команды /cancel: отмена подачи заявки
+async def cancel_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text("Подача заявки отменена.", reply_markup=get_main_keyboard())
+    return ConversationHandler.END
 
-# Обработчик для кнопки "Подать заявку"
-async def submit_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.message.reply_text("Введите данные для заявки", reply_markup=get_main_keyboard())
+# Кнопка постоянной клавиатуры во время подачи заявки: выполняет действие кнопки
+# и завершает диалог, а не разбирается как данные заявки
+def ending_request(callback: Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]):
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        await callback(update, context)
+        return ConversationHandler.END
+
+    return wrapper
 
 # Обработчик команды /rate для отображения кнопок с валютами
 async def rate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    keyboard = [
-        [
-            InlineKeyboardButton("Рубль (RUB)", callback_data='RUB'),
-            InlineKeyboardButton("Доллар (USD)", callback_data='USD'),
-            InlineKeyboardButton("Лира (TRY)", callback_data='TRY')
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Выберите базовую валюту:", reply_markup=reply_markup)
+    await update.message.reply_text("Выберите базовую валюту:", reply_markup=get_rate_keyboard())
 
 # Обработчик выбора валюты
-async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def button(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, base_currency: Optional[str] = None
+) -> None:
     query = update.callback_query
     await query.answer()
 
-    # Определение выбранной валюты как базовой
-    base_currency = query.data
+    # Определение выбранной валюты как базовой; в клавиатурах, отправленных
+    # до перехода на callback_codec, данные кнопки - сам код валюты
+    if base_currency is None:
+        base_currency = query.data
 
     # Получение курса валют относительно выбранной базовой валюты
-    rates = get_exchange_rate(base_currency)
+    matrix = await get_rate_matrix()
 
     # Формирование сообщения с курсами
-    if rates:
-        rate_message = (
-            f"Курс валют относительно {base_currency}:\n"
-            f"1 {base_currency} = {rates.get('USD', 'неизвестно')} USD\n"
-            f"1 {base_currency} = {rates.get('RUB', 'неизвестно')} RUB\n"
-            f"1 {base_currency} = {rates.get('TRY', 'неизвестно')} TRY\n"
-        )
+    if matrix is not None and base_currency in matrix:
+        rate_message = render_rate_message(matrix, base_currency, get_locale(update))
+        # Устаревший снимок: сообщаем, насколько старые данные
+        if matrix.is_expired:
+            rate_message += f"\nДанные обновлены {format_age(matrix.age)} назад"
     else:
         rate_message = "Не удалось получить курс валют."
 
-    # Отправка сообщения с курсом
-    await query.edit_message_text(text=rate_message)
+    # Сообщение уже показывает эти курсы: повторное редактирование
+    # вернуло бы ошибку "message is not modified", пропускаем запрос к API
+    if query.message is not None and query.message.text == rate_message:
+        return
+
+    # Отправка сообщения с курсом; клавиатура остаётся, чтобы сменить валюту
+    await query.edit_message_text(text=rate_message, reply_markup=get_rate_keyboard())
+
+# Загрузка снимка и истории курсов, открытие пула соединений и базы заявок,
+# восстановление книг заявок при запуске
+async def post_init(application: Application) -> None:
+    restore_snapshot()
+    rate_history.directory = os.getenv("RATES_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+    rate_history.load()
+    rate_client.base_url = os.getenv("RATES_API_URL", RATES_API_URL)
+    await rate_client.start()
+    request_store.path = os.getenv("REQUESTS_DB_PATH", DEFAULT_REQUESTS_DB_PATH)
+    await request_store.open()
+    count = order_books.load(await request_store.load_open_requests())
+    logger.info("Книги заявок восстановлены: %d открытых заявок", count)
+    alert_store.path = os.getenv("ALERTS_DB_PATH", DEFAULT_ALERTS_DB_PATH)
+    await alert_store.open()
+    count = alert_index.load(await alert_store.load_index())
+    logger.info("Индекс подписок на курс восстановлен: %d подписок", count)
+
+# Закрытие пула соединений и баз при остановке приложения
+async def post_shutdown(application: Application) -> None:
+    await rate_client.close()
+    await request_store.close()
+    await alert_store.close()
+
+# Обработчик команды /history <BASE> <QUOTE> <период>: статистика курса за период
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    usage = "Использование: /history USD RUB 7d (период: 30m, 12h, 7d, 4w, 1y)"
+    if len(context.args) != 3:
+        await update.message.reply_text(usage)
+        return
+
+    base_currency, quote_currency = context.args[0].upper(), context.args[1].upper()
+    period = parse_period(context.args[2])
+    if period is None:
+        await update.message.reply_text(usage)
+        return
+
+    stats = rate_history.stats(base_currency, quote_currency, time.time() - period)
+    if stats is None:
+        await update.message.reply_text("Нет данных о курсе за этот период.")
+        return
+
+    await update.message.reply_text(
+        f"Курс {base_currency}/{quote_currency} за {context.args[2]} ({stats.count} замеров):\n"
+        f"Мин.: {format_rate(stats.low)}\n"
+        f"Макс.: {format_rate(stats.high)}\n"
+        f"Средний: {format_rate(stats.mean)}\n"
+        f"Изменение: {stats.change:+.2f}%"
+    )
+
+# Описание подписки для списка и ответов
+def format_alert(alert: Alert) -> str:
+    return (
+        f"#{alert.id}: 1 {alert.base} {DIRECTION_NAMES[alert.direction]} "
+        f"{format_rate(alert.threshold)} {alert.quote}"
+    )
+
+# Обработчик команды /alert USD RUB > 95: подписка на курс; без аргументов - список подписок
+async def alert(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    usage = (
+        "Использование: /alert USD RUB > 95 - уведомить, когда 1 USD дороже 95 RUB\n"
+        "/alert USD RUB < 90 - когда дешевле 90 RUB\n"
+        "/unalert <номер> - удалить подписку"
+    )
+    user_id = update.effective_user.id
+    if not context.args:
+        alerts = await alert_store.user_alerts(user_id)
+        if not alerts:
+            await update.message.reply_text(f"Подписок на курс нет.\n{usage}")
+            return
+        await update.message.reply_text(
+            "Ваши подписки на курс:\n" + "\n".join(format_alert(alert) for alert in alerts)
+        )
+        return
+
+    match = ALERT_PATTERN.match(" ".join(context.args))
+    if match is None:
+        await update.message.reply_text(usage)
+        return
+    base, quote = match["base"].upper(), match["quote"].upper()
+    if base not in CURRENCIES or quote not in CURRENCIES or base == quote:
+        await update.message.reply_text(
+            f"Поддерживаются пары из валют: {', '.join(CURRENCIES)}."
+        )
+        return
+    threshold = float(match["threshold"].replace(",", "."))
+    if threshold <= 0:
+        await update.message.reply_text("Порог должен быть больше нуля.")
+        return
+
+    # Условие уже выполнено: сообщаем сразу, подписка сработала бы при первом обновлении
+    matrix = await get_rate_matrix()
+    rate = matrix.rate(base, quote) if matrix is not None else None
+    if rate is not None and is_triggered(match["direction"], threshold, rate):
+        await update.message.reply_text(
+            f"Курс уже {DIRECTION_NAMES[match['direction']]} порога: "
+            f"1 {base} = {format_rate(rate)} {quote}."
+        )
+        return
+
+    if len(await alert_store.user_alerts(user_id)) >= MAX_ALERTS_PER_USER:
+        await update.message.reply_text(
+            f"Не больше {MAX_ALERTS_PER_USER} подписок. Удалите ненужные: /unalert <номер>"
+        )
+        return
+
+    new_alert = await alert_store.add_alert(
+        user_id, update.effective_chat.id, base, quote, match["direction"], threshold
+    )
+    alert_index.add(new_alert)
+    await update.message.reply_text(f"Подписка создана: {format_alert(new_alert)}")
+
+# Обработчик команды /unalert <номер>: удаление подписки на курс
+async def unalert(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if len(context.args) != 1 or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("Использование: /unalert <номер>, номера - в /alert")
+        return
+    removed = await alert_store.remove_alert(
+        update.effective_user.id, int(context.args[0].lstrip("#"))
+    )
+    if removed is None:
+        await update.message.reply_text("Подписка не найдена.")
+        return
+    alert_index.remove(removed)
+    await update.message.reply_text(f"Подписка удалена: {format_alert(removed)}")
+
+# Обработчик команды /cache_stats: статистика кэша курсов (только для администраторов)
+async def cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    stats = cache.stats()
+    await update.message.reply_text(
+        "Кэш курсов:\n"
+        f"Записей: {stats['entries']}\n"
+        f"Память: {stats['bytes']} из {stats['max_bytes']} байт\n"
+        f"Попадания: {stats['hits']}, промахи: {stats['misses']} "
+        f"({stats['hit_ratio']:.1%})\n"
+        f"Вытеснено: {stats['evictions']}, истекло: {stats['expirations']}\n"
+        f"Возраст записей: {format_age(stats['newest_age'])} - {format_age(stats['oldest_age'])}"
+    )
+
+# Обработчик команды /alert_stats: подписки на курс в индексе по парам и условиям
+# (только для администраторов)
+async def alert_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    stats = alert_index.stats()
+    pairs = "".join(f"{key}: {count}\n" for key, count in sorted(stats.items()))
+    await update.message.reply_text(f"Подписки на курс: {len(alert_index)}\n{pairs}".rstrip())
+
+# Обработчик команды /queue_stats: очереди обновлений по чатам (только для администраторов)
+async def queue_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    processor = context.application.update_processor
+    if not isinstance(processor, ChatOrderedUpdateProcessor):
+        await update.message.reply_text("Статистика очередей недоступна.")
+        return
+
+    stats = processor.stats()
+    deepest = ", ".join(f"{key}: {depth}" for key, depth in stats["deepest"]) or "нет"
+    await update.message.reply_text(
+        "Очереди обновлений:\n"
+        f"Лимит одновременных: {stats['max_concurrent_updates']}\n"
+        f"В работе: {stats['in_flight']}, ждут: {stats['waiting']}\n"
+        f"Обработано: {stats['processed']}\n"
+        f"Активных чатов: {stats['active_chats']}, макс. глубина: {stats['max_depth']}\n"
+        f"Самые длинные очереди: {deepest}"
+    )
+
+# Обработчик команды /send_stats: очереди исходящих запросов (только для администраторов)
+async def send_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    scheduler = context.bot.rate_limiter
+    if not isinstance(scheduler, SendScheduler):
+        await update.message.reply_text("Статистика отправки недоступна.")
+        return
+
+    stats = scheduler.stats()
+    lanes = "".join(
+        f"{name}: в очереди {lane['queued']}, отправлено {lane['sent']}, "
+        f"ожидание сред. {lane['wait_avg']:.2f} с, макс. {lane['wait_max']:.2f} с\n"
+        for name, lane in stats["lanes"].items()
+    )
+    await update.message.reply_text(
+        "Исходящие запросы:\n"
+        f"{lanes}"
+        f"Повторов после 429: {stats['retries']}, пауза: {stats['paused_for']:.1f} с\n"
+        f"Чатов с ограничением: {stats['tracked_chats']}"
+    )
+
+# Идентификаторы администраторов из переменной окружения ADMIN_IDS (через запятую)
+def get_admin_ids() -> list:
+    return [int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()]
+
+# Обработчик кнопок, данные которых больше не разбираются (сообщения до обновления бота)
+async def stale_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.callback_query.answer("Кнопка устарела, откройте список заново")
 
 # Обработчик эхо сообщений
 async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(update.message.text)
 
+# Регистрация всех обработчиков бота (используется и в бенчмарках)
+def register_handlers(application: Application) -> None:
+    # Регистрируем обработчики команд
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("rate", rate_command))
+    application.add_handler(CommandHandler("history", history))
+    application.add_handler(CommandHandler("alert", alert))
+    application.add_handler(CommandHandler("unalert", unalert))
+    admin_filter = filters.User(user_id=get_admin_ids())
+    application.add_handler(CommandHandler("cache_stats", cache_stats, filters=admin_filter))
+    application.add_handler(CommandHandler("queue_stats", queue_stats, filters=admin_filter))
+    application.add_handler(CommandHandler("alert_stats", alert_stats, filters=admin_filter))
+    application.add_handler(CommandHandler("send_stats", send_stats, filters=admin_filter))
+    application.add_handler(CommandHandler("all_requests", all_requests, filters=admin_filter))
+
+    # Inline-кнопки: выбор валюты, фильтры и страницы заявок. Данные разбираются
+    # один раз, действие выбирается по номеру, без регулярных выражений
+    application.add_handler(
+        CallbackActionHandler(
+            callback_codec,
+            {
+                RATE_ACTION: button,
+                REQUESTS_ACTION: requests_page,
+            },
+        )
+    )
+
+    # Кнопки выбора валюты в старых сообщениях: данные - код валюты
+    application.add_handler(CallbackQueryHandler(button, pattern=lambda data: data in CURRENCIES))
+
+    # Остальные кнопки старых форматов: сообщаем, что список нужно открыть заново
+    application.add_handler(CallbackQueryHandler(stale_button))
+
+    # Кнопки постоянной клавиатуры, кроме "Подать заявку"
+    main_keyboard_routes = {
+        "Текущий курс": current_rate,
+        "Заявки": requests,
+    }
+
+    # Диалог подачи заявки: кнопка "Подать заявку", затем данные заявки.
+    # Подписи кнопок не считаются данными заявки: кнопка выполняет своё действие
+    # и завершает диалог ("Подать заявку" начинает его заново)
+    application.add_handler(
+        ConversationHandler(
+            entry_points=[ExactTextHandler({"Подать заявку": submit_request})],
+            states={
+                ENTERING_REQUEST: [
+                    MessageHandler(
+                        filters.TEXT
+                        & ~filters.COMMAND
+                        & ~filters.Text([*main_keyboard_routes, "Подать заявку"]),
+                        receive_request,
+                    )
+                ],
+            },
+            fallbacks=[
+                CommandHandler("cancel", cancel_request),
+                ExactTextHandler(
+                    {
+                        **{
+                            text: ending_request(callback)
+                            for text, callback in main_keyboard_routes.items()
+                        },
+                        "Подать заявку": submit_request,
+                    }
+                ),
+            ],
+            conversation_timeout=REQUEST_CONVERSATION_TIMEOUT,
+        )
+    )
+
+    # Обработчик кнопок постоянной клавиатуры: один поиск по словарю на сообщение
+    application.add_handler(ExactTextHandler(main_keyboard_routes))
+
+    # Эхо-ответ на текстовые сообщения
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo))
+
+# Сборка приложения (общая для main() и бенчмарков): обновления одного чата идут
+# строго по порядку, разные чаты - параллельно; исходящие запросы проходят через
+# SendScheduler с учётом лимитов Telegram
+def build_application(
+    builder: ApplicationBuilder,
+    concurrent_updates: int = DEFAULT_CONCURRENT_UPDATES,
+    scheduler: Optional[SendScheduler] = None,
+) -> Application:
+    application = (
+        builder.concurrent_updates(ChatOrderedUpdateProcessor(concurrent_updates))
+        .rate_limiter(scheduler if scheduler is not None else SendScheduler())
+        .build()
+    )
+    register_handlers(application)
+    return application
+
+
 def main() -> None:
     load_dotenv()
 
@@ -109,24 +973,38 @@ def main() -> None:
         logger.error("Переменная окружения TOKEN не установлена.")
         raise ValueError("Переменная окружения TOKEN не установлена")
 
-    application = Application.builder().token(token).build()
-
-    # Регистрируем обработчики команд
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("rate", rate_command))
-    
-    # Обработчик выбора валюты по нажатию кнопки
-    application.add_handler(CallbackQueryHandler(button))
+    # Адрес Bot API: TELEGRAM_API_URL позволяет подключиться к локальной замене.
+    # CONCURRENT_UPDATES - сколько обновлений обрабатывается одновременно.
+    application = build_application(
+        Application.builder()
+        .token(token)
+        .base_url(os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown),
+        int(os.getenv("CONCURRENT_UPDATES", DEFAULT_CONCURRENT_UPDATES)),
+    )
 
-    # Обработчики сообщений с кнопками
-    application.add_handler(MessageHandler(filters.Regex('^Текущий курс$'), current_rate))
-    application.add_handler(MessageHandler(filters.Regex('^Заявки$'), requests))
-    application.add_handler(MessageHandler(filters.Regex('^Подать заявку$'), submit_request))
+    # Фоновое обновление курсов: первый запрос сразу, далее по расписанию API
+    application.job_queue.run_once(refresh_rates, 0)
 
-    # Эхо-ответ на текстовые сообщения
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo))
+    # Режим вебхука, если задан публичный адрес WEBHOOK_URL, иначе long polling
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if not webhook_url:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        return
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Секрет проверяется в заголовке X-Telegram-Bot-Api-Secret-Token каждого запроса.
+    # Если WEBHOOK_SECRET не задан, генерируется новый при каждом запуске.
+    secret_token = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+    application.run_webhook(
+        listen="0.0.0.0",
+        port=int(os.getenv("PORT", DEFAULT_WEBHOOK_PORT)),
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{webhook_url.rstrip('/')}/{WEBHOOK_PATH}",
+        secret_token=secret_token,
+        max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+        allowed_updates=Update.ALL_TYPES,
+    )
 
 if __name__ == "__main__":
     main()
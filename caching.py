@@ -0,0 +1,140 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+# Запись кэша: значение, время создания и истечения, оценка размера в байтах
+class _Entry:
+    __slots__ = ("value", "created_at", "expires_at", "size")
+
+    def __init__(self, value: Any, created_at: float, expires_at: float, size: int) -> None:
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.size = size
+
+
+# LRU-кэш со сроком жизни на каждую запись и статистикой.
+# Ограничивается числом записей и/или бюджетом памяти в байтах: при превышении
+# сначала удаляются истёкшие записи, затем самые давно использованные.
+# Размер записи оценивает sizeof (по умолчанию sys.getsizeof, то есть __sizeof__ значения).
+class InstrumentedCache:
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        timer: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._timer = timer
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.currsize = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Проверка без учёта в статистике и без обновления порядка LRU
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > self._timer()
+
+    def __getitem__(self, key: Hashable) -> Any:
+        entry = self._lookup(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        self._remove(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._lookup(key)
+        return default if entry is None else entry.value
+
+    # Сохранение значения. Срок жизни: ttl секунд или абсолютный момент expires_at,
+    # по умолчанию - ttl кэша.
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+    ) -> None:
+        now = self._timer()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        if key in self._entries:
+            self._remove(key)
+
+        entry = _Entry(value, now, expires_at, self._sizeof(value))
+        self._entries[key] = entry
+        self.currsize += entry.size
+        self._shrink(now)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.currsize = 0
+
+    # Статистика для настройки кэша в продакшене
+    def stats(self) -> Dict[str, Any]:
+        now = self._timer()
+        ages = [now - entry.created_at for entry in self._entries.values()]
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self.currsize,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "oldest_age": max(ages, default=0.0),
+            "newest_age": min(ages, default=0.0),
+        }
+
+    def _lookup(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= self._timer():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.currsize -= entry.size
+
+    def _over_budget(self) -> bool:
+        return (self.maxsize is not None and len(self._entries) > self.maxsize) or (
+            self.max_bytes is not None and self.currsize > self.max_bytes
+        )
+
+    def _shrink(self, now: float) -> None:
+        if not self._over_budget():
+            return
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            self._remove(key)
+            self.expirations += 1
+        while self._over_budget() and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
@@ -0,0 +1,154 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Ограничение Telegram на callback_data кнопки, в байтах
+MAX_CALLBACK_DATA = 64
+
+
+# Поле данных кнопки: кодирует значение в байты и читает его обратно
+class Field:
+    def encode(self, value: Any, out: bytearray) -> None:
+        raise NotImplementedError
+
+    # Возвращает значение и позицию сразу после него
+    def decode(self, data: bytes, pos: int) -> Tuple[Any, int]:
+        raise NotImplementedError
+
+
+def _write_varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+# Неотрицательное целое: 7 бит на байт (varint), числа до 127 занимают один байт
+class UInt(Field):
+    def encode(self, value: int, out: bytearray) -> None:
+        if value < 0:
+            raise ValueError(f"Отрицательное значение для UInt: {value}")
+        _write_varint(value, out)
+
+    def decode(self, data: bytes, pos: int) -> Tuple[int, int]:
+        return _read_varint(data, pos)
+
+
+# Целое со знаком: zigzag поверх varint, небольшие по модулю числа занимают один байт
+class Int(Field):
+    def encode(self, value: int, out: bytearray) -> None:
+        _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+
+    def decode(self, data: bytes, pos: int) -> Tuple[int, int]:
+        value, pos = _read_varint(data, pos)
+        return (value >> 1) ^ -(value & 1), pos
+
+
+# Значение из фиксированного списка (валюта, статус, None): кодируется номером в списке
+class Enum(Field):
+    def __init__(self, *choices: Any) -> None:
+        if len(choices) > 0x7F:
+            raise ValueError("Enum поддерживает не больше 127 значений")
+        self.choices = choices
+        self._index = {choice: index for index, choice in enumerate(choices)}
+
+    def encode(self, value: Any, out: bytearray) -> None:
+        try:
+            out.append(self._index[value])
+        except KeyError:
+            raise ValueError(f"Недопустимое значение {value!r}, ожидается одно из {self.choices}")
+
+    def decode(self, data: bytes, pos: int) -> Tuple[Any, int]:
+        return self.choices[data[pos]], pos + 1
+
+
+# Короткая строка (идентификатор): байт длины и UTF-8
+class Text(Field):
+    def __init__(self, max_length: int = 32) -> None:
+        self.max_length = max_length
+
+    def encode(self, value: str, out: bytearray) -> None:
+        raw = value.encode("utf-8")
+        if len(raw) > self.max_length:
+            raise ValueError(f"Строка длиннее {self.max_length} байт: {value!r}")
+        out.append(len(raw))
+        out += raw
+
+    def decode(self, data: bytes, pos: int) -> Tuple[str, int]:
+        end = pos + 1 + data[pos]
+        if end > len(data):
+            raise IndexError("Строка выходит за конец данных")
+        return data[pos + 1 : end].decode("utf-8"), end
+
+
+# Действие кнопки: номер и поля данных по порядку
+class Action:
+    __slots__ = ("id", "name", "fields")
+
+    def __init__(self, id: int, name: str, fields: Sequence[Field]) -> None:
+        self.id = id
+        self.name = name
+        self.fields = tuple(fields)
+
+    def __repr__(self) -> str:
+        return f"Action({self.id}, {self.name!r})"
+
+    # callback_data для кнопки: номер действия и значения полей в base64 без паддинга
+    def encode(self, *values: Any) -> str:
+        if len(values) != len(self.fields):
+            raise TypeError(f"{self.name}: ожидается {len(self.fields)} значений, получено {len(values)}")
+        out = bytearray()
+        _write_varint(self.id, out)
+        for field, value in zip(self.fields, values):
+            field.encode(value, out)
+        text = base64.urlsafe_b64encode(out).rstrip(b"=").decode("ascii")
+        if len(text) > MAX_CALLBACK_DATA:
+            raise ValueError(f"{self.name}: callback_data длиннее {MAX_CALLBACK_DATA} байт")
+        return text
+
+
+# Кодек данных кнопок. Данные - номер действия и значения его полей в плотном
+# двоичном виде, записанные URL-безопасным base64, поэтому помещаются в 64 байта
+# callback_data и не требуют хранить данные кнопок на сервере.
+# Разбор - одно декодирование base64 и проход по полям действия, без регулярных выражений.
+class CallbackCodec:
+    def __init__(self) -> None:
+        self._actions: Dict[int, Action] = {}
+
+    # Регистрация действия; номера действий нельзя менять, пока в чатах есть кнопки с ними
+    def action(self, id: int, name: str, *fields: Field) -> Action:
+        if id in self._actions:
+            raise ValueError(f"Действие {id} уже зарегистрировано: {self._actions[id].name}")
+        action = self._actions[id] = Action(id, name, fields)
+        return action
+
+    # Действие и значения полей, или None для чужих, устаревших и повреждённых данных
+    def decode(self, data: str) -> Optional[Tuple[Action, List[Any]]]:
+        try:
+            # validate: символы вне алфавита (данные других форматов) - ошибка, а не пропуск
+            raw = base64.b64decode(data + "=" * (-len(data) % 4), altchars=b"-_", validate=True)
+            action_id, pos = _read_varint(raw, 0)
+            action = self._actions.get(action_id)
+            if action is None:
+                return None
+            values = []
+            for field in action.fields:
+                value, pos = field.decode(raw, pos)
+                values.append(value)
+        except (binascii.Error, ValueError, IndexError, UnicodeDecodeError):
+            return None
+        if pos != len(raw):
+            return None
+        return action, values
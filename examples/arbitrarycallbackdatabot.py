@@ -12,6 +12,7 @@ To use arbitrary callback data, you must install PTB via
 `pip install "python-telegram-bot[callback-data]"`
 """
 import logging
+import os
 from typing import List, Tuple, cast
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
@@ -21,9 +22,11 @@ from telegram.ext import (
     CommandHandler,
     ContextTypes,
     InvalidCallbackData,
-    PicklePersistence,
 )
 
+from callbackdatastore import SpillingExtBot
+from logpersistence import LogPersistence
+
 # Enable logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -33,6 +36,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a message with 5 inline buttons attached."""
@@ -93,15 +99,18 @@ async def handle_invalid_button(update: Update, context: ContextTypes.DEFAULT_TY
 def main() -> None:
     """Run the bot."""
     # We use persistence to demonstrate how buttons can still work after the bot was restarted
-    persistence = PicklePersistence(filepath="arbitrarycallbackdatabot")
-    # Create the Application and pass it your bot's token.
-    application = (
-        Application.builder()
-        .token("TOKEN")
-        .persistence(persistence)
-        .arbitrary_callback_data(True)
-        .build()
+    persistence = LogPersistence(filepath="arbitrarycallbackdatabot.log")
+    # Keyboards beyond the memory budget are moved to an SQLite file and read back when
+    # one of their buttons is pressed, so memory stays bounded and no button is lost
+    bot = SpillingExtBot(
+        "TOKEN",
+        base_url=TELEGRAM_API_URL,
+        callback_data_path="arbitrarycallbackdatabot.sqlite",
+        callback_data_maxsize=1024,
+        callback_data_max_bytes=4 * 1024 * 1024,
     )
+    # Create the Application and pass it your bot.
+    application = Application.builder().bot(bot).persistence(persistence).build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# This program is dedicated to the public domain under the CC0 license.
+
+"""
+A resumable, rate limited broadcast of one message to many chats.
+
+:class:`Broadcaster` sends a message to a list of chats with a fixed number of concurrent
+workers. The workers share one send schedule of ``rate`` messages per second, which keeps
+the broadcast under Telegram's global limit of about 30 messages per second. A
+:class:`telegram.error.RetryAfter` pauses all workers at once. Chats that blocked the bot or
+no longer exist are reported through ``on_unreachable``, so the caller can stop tracking
+them.
+
+Progress is checkpointed to disk: the broadcast itself is written to ``path`` and every
+finished chat is appended to ``path + ".done"``. After a restart, :meth:`Broadcaster.resume`
+continues with the chats that are not in the checkpoint yet. The log is flushed every
+``checkpoint_interval`` seconds, so at most that many seconds of sends may be repeated
+after a crash.
+
+Usage:
+    broadcaster = Broadcaster(application.bot, "broadcast.json")
+    await broadcaster.start(chat_ids, text="Hello!", report_chat_id=admin_chat_id)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from telegram import Bot
+from telegram.error import BadRequest, ChatMigrated, Forbidden, RetryAfter, TelegramError, TimedOut
+
+logger = logging.getLogger(__name__)
+
+# One finished chat in the ".done" log: chat id and outcome
+RECORD = struct.Struct("<qB")
+
+SENT = 0
+FAILED = 1
+UNREACHABLE = 2
+
+# Attempts per chat for network errors before the chat is counted as failed
+MAX_ATTEMPTS = 3
+
+# Error descriptions that mean the chat will never accept messages from the bot again
+UNREACHABLE_ERRORS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+class BroadcastCheckpoint:
+    """The state of a broadcast on disk.
+
+    ``path`` holds the message and the recipients as JSON and is replaced atomically.
+    ``path + ".done"`` is an append-only log of fixed size records, one per finished chat.
+
+    Args:
+        path (:obj:`str` | :obj:`pathlib.Path`): The JSON file of the broadcast.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.done_path = Path(f"{path}.done")
+        self._done_file: Optional[Any] = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def create(self, state: Dict[str, Any]) -> None:
+        """Writes a new broadcast and starts an empty log."""
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        self.done_path.unlink(missing_ok=True)
+        os.replace(temporary, self.path)
+
+    def load(self) -> Dict[str, Any]:
+        """The broadcast and ``"done"``: the outcome of each finished chat by chat id. A
+        record cut short by a crash is dropped.
+        """
+        with open(self.path, encoding="utf-8") as file:
+            state = json.load(file)
+        done: Dict[int, int] = {}
+        if self.done_path.exists():
+            data = self.done_path.read_bytes()
+            usable = len(data) - len(data) % RECORD.size
+            for chat_id, outcome in RECORD.iter_unpack(data[:usable]):
+                done[chat_id] = outcome
+            if usable != len(data):
+                with open(self.done_path, "r+b") as file:
+                    file.truncate(usable)
+        state["done"] = done
+        return state
+
+    def record(self, chat_id: int, outcome: int) -> None:
+        if self._done_file is None:
+            self._done_file = open(self.done_path, "ab")
+        self._done_file.write(RECORD.pack(chat_id, outcome))
+
+    def flush(self) -> None:
+        if self._done_file is not None:
+            self._done_file.flush()
+            os.fsync(self._done_file.fileno())
+
+    def close(self) -> None:
+        if self._done_file is not None:
+            self.flush()
+            self._done_file.close()
+            self._done_file = None
+
+    def remove(self) -> None:
+        """Deletes the checkpoint of a finished or cancelled broadcast."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.done_path.unlink(missing_ok=True)
+
+
+class Broadcaster:
+    """Sends one message to many chats, see the module docstring.
+
+    Either ``text`` or ``from_chat_id`` and ``message_id`` (copied with
+    :meth:`telegram.Bot.copy_message`) make the message of a broadcast.
+
+    Args:
+        bot (:class:`telegram.Bot`): The bot to send with.
+        path (:obj:`str` | :obj:`pathlib.Path`): The checkpoint file.
+        rate (:obj:`float`, optional): Messages per second over all workers. Defaults to
+            ``25``, a margin under Telegram's limit of about 30.
+        concurrency (:obj:`int`, optional): Requests in flight at once. Defaults to ``8``.
+        on_unreachable (Callable[[:obj:`int`], None], optional): Called with the id of each
+            chat that blocked the bot or no longer exists.
+        on_migrated (Callable[[:obj:`int`, :obj:`int`], None], optional): Called with the old
+            and the new id of a group that became a supergroup.
+        checkpoint_interval (:obj:`float`, optional): Seconds between flushes of the log.
+            Defaults to ``1``.
+        report_interval (:obj:`float`, optional): Seconds between updates of the progress
+            message. Defaults to ``10``.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        path: Union[str, Path],
+        rate: float = 25.0,
+        concurrency: int = 8,
+        on_unreachable: Optional[Callable[[int], None]] = None,
+        on_migrated: Optional[Callable[[int, int], None]] = None,
+        checkpoint_interval: float = 1.0,
+        report_interval: float = 10.0,
+    ):
+        self.bot = bot
+        self.checkpoint = BroadcastCheckpoint(path)
+        self.interval = 1.0 / rate
+        self.concurrency = concurrency
+        self.on_unreachable = on_unreachable
+        self.on_migrated = on_migrated
+        self.checkpoint_interval = checkpoint_interval
+        self.report_interval = report_interval
+        self.counts = [0, 0, 0]
+        self.total = 0
+        self._state: Dict[str, Any] = {}
+        self._pending: List[int] = []
+        self._next_slot = 0.0
+        self._started = 0.0
+        self._finished_at_start = 0
+        self._report_message_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(
+        self,
+        chat_ids: Iterable[int],
+        text: Optional[str] = None,
+        from_chat_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        report_chat_id: Optional[int] = None,
+    ) -> None:
+        """Checkpoints a new broadcast and starts sending it in the background.
+
+        Raises:
+            :exc:`RuntimeError`: If a broadcast is already running.
+        """
+        if self.running:
+            raise RuntimeError("A broadcast is already running")
+        state = {
+            "text": text,
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "report_chat_id": report_chat_id,
+            "recipients": sorted(set(chat_ids)),
+            "created_at": time.time(),
+        }
+        await asyncio.to_thread(self.checkpoint.create, state)
+        state["done"] = {}
+        self._begin(state)
+
+    async def resume(self) -> bool:
+        """Continues the broadcast in the checkpoint, if there is one."""
+        if self.running or not self.checkpoint.exists():
+            return False
+        state = await asyncio.to_thread(self.checkpoint.load)
+        self._begin(state)
+        logger.info("Resuming broadcast: %d of %d chats left", len(self._pending), self.total)
+        return True
+
+    async def cancel(self) -> bool:
+        """Stops the running broadcast and deletes its checkpoint."""
+        if not self.running:
+            return False
+        await self.stop()
+        await asyncio.to_thread(self.checkpoint.remove)
+        return True
+
+    async def stop(self) -> None:
+        """Stops the running broadcast and keeps its checkpoint for :meth:`resume`."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.checkpoint.close()
+
+    def status(self) -> str:
+        """Progress, throughput and the estimated time left, as text."""
+        sent, failed, unreachable = self.counts
+        finished = sent + failed + unreachable
+        elapsed = time.monotonic() - self._started
+        speed = (finished - self._finished_at_start) / elapsed if elapsed > 0 else 0.0
+        left = self.total - finished
+        if not self.running and left:
+            eta = "paused"
+        elif not left:
+            eta = "done"
+        elif speed > 0:
+            eta = f"~{int(left / speed) // 60} min {int(left / speed) % 60} s left"
+        else:
+            eta = "estimating"
+        return (
+            f"Broadcast: {finished}/{self.total} ({finished / max(self.total, 1):.0%})\n"
+            f"Sent: {sent}, failed: {failed}, unreachable: {unreachable}\n"
+            f"Speed: {speed:.1f} msg/s, {eta}"
+        )
+
+    def _begin(self, state: Dict[str, Any]) -> None:
+        done = state["done"]
+        self._state = state
+        self.total = len(state["recipients"])
+        self.counts = [0, 0, 0]
+        for outcome in done.values():
+            self.counts[outcome] += 1
+        self._finished_at_start = len(done)
+        # Popped from the end, so reversed to send in the checkpoint's order
+        self._pending = [
+            chat_id for chat_id in reversed(state["recipients"]) if chat_id not in done
+        ]
+        self._started = time.monotonic()
+        self._next_slot = 0.0
+        self._report_message_id = None
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        flusher = asyncio.create_task(self._periodically(self.checkpoint_interval, self._flush))
+        reporter = asyncio.create_task(self._periodically(self.report_interval, self._report))
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        finally:
+            flusher.cancel()
+            reporter.cancel()
+            await asyncio.to_thread(self.checkpoint.flush)
+        await self._report()
+        await asyncio.to_thread(self.checkpoint.remove)
+        logger.info("Broadcast finished: %s", self.counts)
+
+    async def _periodically(self, interval: float, func: Callable[[], Any]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await func()
+
+    async def _flush(self) -> None:
+        await asyncio.to_thread(self.checkpoint.flush)
+
+    async def _worker(self) -> None:
+        while self._pending:
+            chat_id = self._pending.pop()
+            outcome = await self._deliver(chat_id)
+            self.counts[outcome] += 1
+            self.checkpoint.record(chat_id, outcome)
+
+    # All workers take turns from one schedule: each send reserves the next free slot
+    async def _wait_for_slot(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _deliver(self, chat_id: int) -> int:
+        attempts = 0
+        while True:
+            await self._wait_for_slot()
+            try:
+                await self._send(chat_id)
+                return SENT
+            except RetryAfter as exc:
+                # Flood control applies to the whole bot: everyone waits, the chat is retried
+                self._next_slot = max(self._next_slot, time.monotonic() + exc.retry_after)
+            except ChatMigrated as exc:
+                if self.on_migrated is not None:
+                    self.on_migrated(chat_id, exc.new_chat_id)
+                chat_id = exc.new_chat_id
+            except Forbidden:
+                return self._unreachable(chat_id)
+            except BadRequest as exc:
+                if any(error in exc.message.lower() for error in UNREACHABLE_ERRORS):
+                    return self._unreachable(chat_id)
+                logger.warning("Broadcast to %s failed: %s", chat_id, exc)
+                return FAILED
+            except TimedOut as exc:
+                # The message may have been delivered; retrying risks a duplicate
+                logger.warning("Broadcast to %s timed out: %s", chat_id, exc)
+                return FAILED
+            except TelegramError as exc:
+                attempts += 1
+                logger.warning("Broadcast to %s failed (attempt %d): %s", chat_id, attempts, exc)
+                if attempts >= MAX_ATTEMPTS:
+                    return FAILED
+
+    async def _send(self, chat_id: int) -> None:
+        state = self._state
+        if state["text"] is not None:
+            await self.bot.send_message(chat_id=chat_id, text=state["text"])
+        else:
+            await self.bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=state["from_chat_id"],
+                message_id=state["message_id"],
+            )
+
+    def _unreachable(self, chat_id: int) -> int:
+        if self.on_unreachable is not None:
+            self.on_unreachable(chat_id)
+        return UNREACHABLE
+
+    async def _report(self) -> None:
+        chat_id = self._state.get("report_chat_id")
+        if chat_id is None:
+            return
+        text = self.status()
+        try:
+            if self._report_message_id is None:
+                message = await self.bot.send_message(chat_id=chat_id, text=text)
+                self._report_message_id = message.message_id
+            else:
+                await self.bot.edit_message_text(
+                    text=text, chat_id=chat_id, message_id=self._report_message_id
+                )
+        except TelegramError as exc:
+            logger.warning("Could not report broadcast progress: %s", exc)
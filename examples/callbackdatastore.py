@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# This program is dedicated to the public domain under the CC0 license.
+
+"""
+A bounded store for arbitrary callback data that spills to disk.
+
+With ``arbitrary_callback_data(True)``, :class:`telegram.ext.CallbackDataCache` keeps the
+Python objects of every keyboard in memory. Its LRU bound drops the least recently used
+keyboards for good, so their buttons stop working. :class:`SpillingCallbackDataCache`
+keeps at most ``maxsize`` keyboards and ``max_bytes`` bytes of them in memory. Keyboards
+over either limit are moved to an SQLite key-value file, and a keyboard on disk is read
+back when one of its buttons is pressed. Memory stays bounded no matter how many
+keyboards the bot sends, and no button is lost to eviction.
+
+Usage:
+    bot = SpillingExtBot("TOKEN", callback_data_path="callbackdata.sqlite")
+    application = Application.builder().bot(bot).build()
+
+The size of a keyboard is measured as the length of its pickled data. Disk access is
+synchronous, as PTB resolves callback data while decoding an update, but it is one indexed
+lookup per button press on a keyboard that is no longer in memory.
+"""
+
+import logging
+import pickle
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, MutableMapping, Optional, Tuple, Union
+
+from telegram.ext import CallbackDataCache, ExtBot
+
+logger = logging.getLogger(__name__)
+
+CDCData = Tuple[list, dict]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keyboards (
+    uuid TEXT PRIMARY KEY,
+    access_time REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_keyboards_access_time ON keyboards (access_time);
+"""
+
+
+class SpillingKeyboardStore(MutableMapping):
+    """Keyboard data by keyboard uuid: recently used keyboards in memory, the rest on disk.
+
+    Reading a keyboard from disk moves it back to memory. Iteration and :func:`len` cover
+    both, but :meth:`hot_items` should be used to avoid reading the disk part.
+
+    Args:
+        path (:obj:`str` | :obj:`pathlib.Path`): The SQLite file for spilled keyboards.
+        maxsize (:obj:`int`): Keyboards kept in memory.
+        max_bytes (:obj:`int`): Pickled size of the keyboards kept in memory.
+    """
+
+    def __init__(self, path: Union[str, Path], maxsize: int, max_bytes: int):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.currsize = 0
+        self.spills = 0
+        self.reloads = 0
+        self._hot: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def __getitem__(self, uuid: str) -> Any:
+        entry = self._hot.get(uuid)
+        if entry is not None:
+            self._hot.move_to_end(uuid)
+            return entry[0]
+
+        row = self._connection.execute(
+            "SELECT data FROM keyboards WHERE uuid = ?", (uuid,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(uuid)
+        data = pickle.loads(row[0])
+        self._connection.execute("DELETE FROM keyboards WHERE uuid = ?", (uuid,))
+        self.reloads += 1
+        self._put(uuid, data, len(row[0]))
+        return data
+
+    def __setitem__(self, uuid: str, data: Any) -> None:
+        self._discard_hot(uuid)
+        self._put(uuid, data, len(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def __delitem__(self, uuid: str) -> None:
+        # A keyboard restored from the persistence may also have a copy on disk
+        in_memory = self._discard_hot(uuid)
+        cursor = self._connection.execute("DELETE FROM keyboards WHERE uuid = ?", (uuid,))
+        if not in_memory and cursor.rowcount == 0:
+            raise KeyError(uuid)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self._hot)
+        for (uuid,) in self._connection.execute("SELECT uuid FROM keyboards"):
+            yield uuid
+
+    def __len__(self) -> int:
+        (spilled,) = self._connection.execute("SELECT COUNT(*) FROM keyboards").fetchone()
+        return len(self._hot) + spilled
+
+    def hot_items(self) -> Iterator[Tuple[str, Any]]:
+        """The keyboards in memory, least recently used first."""
+        return ((uuid, entry[0]) for uuid, entry in self._hot.items())
+
+    def clear(self) -> None:
+        self._hot.clear()
+        self.currsize = 0
+        self._connection.execute("DELETE FROM keyboards")
+
+    def drop_older_than(self, cutoff: float) -> None:
+        """Removes the keyboards last used before ``cutoff``, in memory and on disk."""
+        for uuid in [uuid for uuid, data in self.hot_items() if data.access_time < cutoff]:
+            self._discard_hot(uuid)
+        self._connection.execute("DELETE FROM keyboards WHERE access_time < ?", (cutoff,))
+
+    def close(self) -> None:
+        """Moves the keyboards in memory to disk and closes the file."""
+        if self._connection is None:
+            return
+        while self._hot:
+            self._spill()
+        self._connection.close()
+        self._connection = None
+
+    def _put(self, uuid: str, data: Any, size: int) -> None:
+        self._hot[uuid] = (data, size)
+        self.currsize += size
+        while len(self._hot) > 1 and (
+            len(self._hot) > self.maxsize or self.currsize > self.max_bytes
+        ):
+            self._spill()
+
+    def _discard_hot(self, uuid: str) -> bool:
+        entry = self._hot.pop(uuid, None)
+        if entry is None:
+            return False
+        self.currsize -= entry[1]
+        return True
+
+    def _spill(self) -> None:
+        uuid, (data, size) = self._hot.popitem(last=False)
+        self.currsize -= size
+        self._connection.execute(
+            "INSERT OR REPLACE INTO keyboards (uuid, access_time, data) VALUES (?, ?, ?)",
+            (uuid, data.access_time, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        self.spills += 1
+
+
+class SpillingCallbackDataCache(CallbackDataCache):
+    """A :class:`telegram.ext.CallbackDataCache` whose keyboards live in a
+    :class:`SpillingKeyboardStore`.
+
+    Only the keyboards in memory are handed to the persistence: the spilled ones are
+    already stored in the SQLite file and survive a restart on their own.
+
+    Args:
+        bot (:class:`telegram.ext.ExtBot`): The bot this cache is for.
+        path (:obj:`str` | :obj:`pathlib.Path`): The SQLite file for spilled keyboards.
+        maxsize (:obj:`int`, optional): Keyboards kept in memory and callback queries
+            remembered. Defaults to ``1024``.
+        max_bytes (:obj:`int`, optional): Pickled size of the keyboards kept in memory.
+            Defaults to 4 MiB.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        bot: ExtBot,
+        path: Union[str, Path],
+        maxsize: int = 1024,
+        max_bytes: int = 4 * 1024 * 1024,
+    ):
+        super().__init__(bot=bot, maxsize=maxsize)
+        self._keyboard_data = SpillingKeyboardStore(path, maxsize=maxsize, max_bytes=max_bytes)
+
+    @property
+    def store(self) -> SpillingKeyboardStore:
+        """:class:`SpillingKeyboardStore`: The keyboard data."""
+        return self._keyboard_data  # type: ignore[return-value]
+
+    @property
+    def persistence_data(self) -> CDCData:
+        """The keyboards in memory and the callback queries, in the format of
+        :attr:`telegram.ext.CallbackDataCache.persistence_data`.
+        """
+        return [data.to_tuple() for _, data in self.store.hot_items()], dict(
+            self._callback_queries.items()
+        )
+
+    def clear_callback_data(self, time_cutoff: Optional[Union[float, datetime]] = None) -> None:
+        """Clears the keyboards in memory and on disk, optionally only those last used
+        before ``time_cutoff``. Naive datetimes are read in the bot's default time zone
+        or UTC.
+        """
+        if not time_cutoff:
+            self.store.clear()
+            return
+        if isinstance(time_cutoff, datetime):
+            if time_cutoff.tzinfo is None:
+                defaults = self.bot.defaults
+                tzinfo = defaults.tzinfo if defaults is not None else timezone.utc
+                time_cutoff = time_cutoff.replace(tzinfo=tzinfo)
+            time_cutoff = time_cutoff.timestamp()
+        self.store.drop_older_than(time_cutoff)
+
+
+class SpillingExtBot(ExtBot):
+    """An :class:`telegram.ext.ExtBot` with arbitrary callback data stored in a
+    :class:`SpillingCallbackDataCache`.
+
+    Args:
+        *args: Passed to :class:`telegram.ext.ExtBot`.
+        callback_data_path (:obj:`str` | :obj:`pathlib.Path`): The SQLite file for spilled
+            keyboards.
+        callback_data_maxsize (:obj:`int`, optional): Keyboards kept in memory. Defaults
+            to ``1024``.
+        callback_data_max_bytes (:obj:`int`, optional): Pickled size of the keyboards kept
+            in memory. Defaults to 4 MiB.
+        **kwargs: Passed to :class:`telegram.ext.ExtBot`.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        *args: Any,
+        callback_data_path: Union[str, Path],
+        callback_data_maxsize: int = 1024,
+        callback_data_max_bytes: int = 4 * 1024 * 1024,
+        **kwargs: Any,
+    ):
+        kwargs["arbitrary_callback_data"] = True
+        super().__init__(*args, **kwargs)
+        self._callback_data_cache = SpillingCallbackDataCache(
+            self,
+            callback_data_path,
+            maxsize=callback_data_maxsize,
+            max_bytes=callback_data_max_bytes,
+        )
+
+    async def shutdown(self) -> None:
+        await super().shutdown()
+        self._callback_data_cache.store.close()  # type: ignore[union-attr]
@@ -5,6 +5,9 @@
 """
 Simple Bot to handle '(my_)chat_member' updates.
 Greets new users & keeps track of which chats the bot is in.
+Admins (the user IDs in ADMIN_IDS, comma separated) can /broadcast a message to all of
+these chats. See broadcast.py for how the broadcast is rate limited and resumed after a
+restart.
 
 Usage:
 Press Ctrl-C on the command line or send a signal to the process to stop the
@@ -12,6 +15,7 @@ bot.
 """
 
 import logging
+import os
 from typing import Optional, Tuple
 
 from telegram import Chat, ChatMember, ChatMemberUpdated, Update
@@ -25,6 +29,8 @@ from telegram.ext import (
     filters,
 )
 
+from broadcast import Broadcaster
+
 # Enable logging
 
 logging.basicConfig(
@@ -36,6 +42,17 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Users allowed to broadcast
+ADMIN_IDS = [int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()]
+
+# Checkpoint of the running broadcast, see broadcast.py
+BROADCAST_PATH = "chatmemberbot_broadcast.json"
+
+CHAT_ID_KEYS = ("user_ids", "group_ids", "channel_ids")
+
 
 def extract_status_change(chat_member_update: ChatMemberUpdated) -> Optional[Tuple[bool, bool]]:
     """Takes a ChatMemberUpdated instance and extracts whether the 'old_chat_member' was a member
@@ -154,15 +171,112 @@ async def start_private_chat(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the text after the command, or the message replied to, to all known chats."""
+    broadcaster: Broadcaster = context.bot_data["broadcaster"]
+    if broadcaster.running:
+        await update.effective_message.reply_text(
+            "A broadcast is already running. See /broadcast_status or /broadcast_cancel."
+        )
+        return
+
+    message = update.effective_message
+    reply = message.reply_to_message
+    text = None
+    if reply is None:
+        parts = message.text.split(None, 1)
+        if len(parts) < 2:
+            await message.reply_text(
+                "Usage: /broadcast <text>, or reply /broadcast to the message to send."
+            )
+            return
+        text = parts[1]
+
+    chat_ids = set()
+    for key in CHAT_ID_KEYS:
+        chat_ids.update(context.bot_data.setdefault(key, set()))
+    await broadcaster.start(
+        chat_ids,
+        text=text,
+        from_chat_id=reply.chat_id if reply is not None else None,
+        message_id=reply.message_id if reply is not None else None,
+        report_chat_id=update.effective_chat.id,
+    )
+    logger.info(
+        "%s started a broadcast to %d chats", update.effective_user.full_name, len(chat_ids)
+    )
+
+
+async def broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows the progress of the last broadcast"""
+    broadcaster: Broadcaster = context.bot_data["broadcaster"]
+    await update.effective_message.reply_text(broadcaster.status())
+
+
+async def broadcast_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stops the running broadcast for good"""
+    broadcaster: Broadcaster = context.bot_data["broadcaster"]
+    if await broadcaster.cancel():
+        await update.effective_message.reply_text(f"Cancelled.\n{broadcaster.status()}")
+    else:
+        await update.effective_message.reply_text("No broadcast is running.")
+
+
+async def post_init(application: Application) -> None:
+    """Sets up the broadcaster and resumes a broadcast interrupted by a restart."""
+    bot_data = application.bot_data
+
+    def forget_chat(chat_id: int) -> None:
+        logger.info("Chat %s is unreachable, no longer tracking it", chat_id)
+        for key in CHAT_ID_KEYS:
+            bot_data.setdefault(key, set()).discard(chat_id)
+
+    def migrate_chat(old_chat_id: int, new_chat_id: int) -> None:
+        group_ids = bot_data.setdefault("group_ids", set())
+        group_ids.discard(old_chat_id)
+        group_ids.add(new_chat_id)
+
+    broadcaster = Broadcaster(
+        application.bot,
+        BROADCAST_PATH,
+        on_unreachable=forget_chat,
+        on_migrated=migrate_chat,
+    )
+    bot_data["broadcaster"] = broadcaster
+    await broadcaster.resume()
+
+
+async def post_stop(application: Application) -> None:
+    """Stops a running broadcast, keeping its checkpoint to resume on the next start."""
+    await application.bot_data["broadcaster"].stop()
+
+
 def main() -> None:
     """Start the bot."""
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token("TOKEN").build()
+    application = (
+        Application.builder()
+        .token("TOKEN")
+        .base_url(TELEGRAM_API_URL)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
 
     # Keep track of which chats the bot is in
     application.add_handler(ChatMemberHandler(track_chats, ChatMemberHandler.MY_CHAT_MEMBER))
     application.add_handler(CommandHandler("show_chats", show_chats))
 
+    # Broadcast to all chats the bot is in, admins only
+    admin_filter = filters.User(user_id=ADMIN_IDS)
+    application.add_handler(CommandHandler("broadcast", broadcast, filters=admin_filter))
+    application.add_handler(
+        CommandHandler("broadcast_status", broadcast_status, filters=admin_filter)
+    )
+    application.add_handler(
+        CommandHandler("broadcast_cancel", broadcast_cancel, filters=admin_filter)
+    )
+
     # Handle members joining/leaving chats.
     application.add_handler(ChatMemberHandler(greet_chat_members, ChatMemberHandler.CHAT_MEMBER))
 
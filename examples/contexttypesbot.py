@@ -11,6 +11,7 @@ bot.
 """
 
 import logging
+import os
 from collections import defaultdict
 from typing import DefaultDict, Optional, Set
 
@@ -35,6 +36,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 
 class ChatData:
     """Custom class for chat_data. Here we store data per message."""
@@ -128,7 +132,13 @@ async def track_users(update: Update, context: CustomContext) -> None:
 def main() -> None:
     """Run the bot."""
     context_types = ContextTypes(context=CustomContext, chat_data=ChatData)
-    application = Application.builder().token("TOKEN").context_types(context_types).build()
+    application = (
+        Application.builder()
+        .token("TOKEN")
+        .base_url(TELEGRAM_API_URL)
+        .context_types(context_types)
+        .build()
+    )
 
     # run track_users in its own group to not interfere with the user handlers
     application.add_handler(TypeHandler(Update, track_users), group=-1)
@@ -17,6 +17,7 @@ import asyncio
 import html
 import json
 import logging
+import os
 from dataclasses import dataclass
 from uuid import uuid4
 
@@ -46,6 +47,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 # Define configuration constants
 URL = "https://domain.tld"
 ADMIN_CHAT_ID = 123456
@@ -139,7 +143,12 @@ context_types = ContextTypes(context=CustomContext)
 # Here we set updater to None because we want our custom webhook server to handle the updates
 # and hence we don't need an Updater instance
 ptb_application = (
-    Application.builder().token(TOKEN).updater(None).context_types(context_types).build()
+    Application.builder()
+    .token(TOKEN)
+    .base_url(TELEGRAM_API_URL)
+    .updater(None)
+    .context_types(context_types)
+    .build()
 )
 
 # register handlers
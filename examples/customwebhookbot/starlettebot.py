@@ -16,6 +16,7 @@ Press Ctrl-C on the command line or send a signal to the process to stop the bot
 import asyncio
 import html
 import logging
+import os
 from dataclasses import dataclass
 from http import HTTPStatus
 
@@ -45,6 +46,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 # Define configuration constants
 URL = "https://domain.tld"
 ADMIN_CHAT_ID = 123456
@@ -106,7 +110,12 @@ async def main() -> None:
     # Here we set updater to None because we want our custom webhook server to handle the updates
     # and hence we don't need an Updater instance
     application = (
-        Application.builder().token(TOKEN).updater(None).context_types(context_types).build()
+        Application.builder()
+        .token(TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .updater(None)
+        .context_types(context_types)
+        .build()
     )
 
     # register handlers
@@ -19,6 +19,7 @@ bot.
 """
 
 import logging
+import os
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, helpers
 from telegram.constants import ParseMode
@@ -34,6 +35,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 # Define constants that will allow us to reuse the deep-linking parameters.
 CHECK_THIS_OUT = "check-this-out"
 USING_ENTITIES = "using-entities-here"
@@ -101,7 +105,7 @@ async def deep_linked_level_4(update: Update, context: ContextTypes.DEFAULT_TYPE
 def main() -> None:
     """Start the bot."""
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token("TOKEN").build()
+    application = Application.builder().token("TOKEN").base_url(TELEGRAM_API_URL).build()
 
     # More info on what deep linking actually is (read this first if it's unclear to you):
     # https://core.telegram.org/bots/features#deep-linking
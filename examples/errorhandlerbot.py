@@ -6,6 +6,7 @@
 import html
 import json
 import logging
+import os
 import traceback
 
 from telegram import Update
@@ -21,6 +22,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 # This can be your own ID, or one for a developer group/channel.
 # You can use the /start command of this bot to see your chat id.
 DEVELOPER_CHAT_ID = 123456789
@@ -70,7 +74,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 def main() -> None:
     """Run the bot."""
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token("TOKEN").build()
+    application = Application.builder().token("TOKEN").base_url(TELEGRAM_API_URL).build()
 
     # Register the commands...
     application.add_handler(CommandHandler("start", start))
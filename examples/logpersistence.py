@@ -0,0 +1,721 @@
+#!/usr/bin/env python
+# This program is dedicated to the public domain under the CC0 license.
+
+"""
+A persistence class that writes only the data that changed.
+
+:class:`telegram.ext.PicklePersistence` pickles and rewrites the whole file whenever
+any ``user_data``, ``chat_data`` or conversation state changes, so the cost of every
+save grows with the total number of users. :class:`LogPersistence` instead appends one
+record per changed key to a log file. A key whose pickled value is unchanged since
+the last write is skipped, so the cost of a save is proportional to the amount of
+changed data. When the log holds many more records than there are live keys, it is
+compacted: the current state is written to a new file which atomically replaces the
+old one.
+
+Usage:
+    persistence = LogPersistence(filepath="conversationbot.log")
+    application = Application.builder().token("TOKEN").persistence(persistence).build()
+
+With ``lazy=True``, ``user_data`` and ``chat_data`` are not loaded at startup. The
+persistence keeps only the position of each value in the log, checkpointed to an index
+file next to it, and :class:`LazyDataApplication` reads an entry the first time it is
+accessed and evicts idle entries once there are too many:
+
+    persistence = LogPersistence(filepath="conversationbot.log", lazy=True)
+    application = (
+        Application.builder()
+        .token("TOKEN")
+        .persistence(persistence)
+        .application_class(LazyDataApplication, kwargs={"max_user_data": 10000})
+        .build()
+    )
+
+Records are written to the OS on every change and synced to disk on :meth:`flush`
+and on compaction. A record cut short by a crash is discarded on the next start.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from telegram.ext import Application, BasePersistence, ContextTypes, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+CDCData = Tuple[List[Tuple[str, float, Dict[str, Any]]], Dict[str, str]]
+ConversationKey = Tuple[Union[int, str], ...]
+ConversationDict = Dict[ConversationKey, object]
+
+# Record: section, operation, length of the pickled key, length of the pickled value
+RECORD_HEADER = struct.Struct("<BBII")
+
+USER_DATA, CHAT_DATA, BOT_DATA, CALLBACK_DATA, CONVERSATIONS = range(1, 6)
+OPERATION_DELETE, OPERATION_SET = 0, 1
+
+# Sections that lazy mode reads from the log on demand
+LAZY_SECTIONS = (USER_DATA, CHAT_DATA)
+
+# Index file: magic, version, inode of the log, indexed log length, records in it,
+# length of the eagerly loaded records that follow the header
+INDEX_MAGIC = b"LPIX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHQQQQ")
+INDEX_COUNT = struct.Struct("<Q")
+
+Location = Tuple[int, int]
+
+
+class _KeyIndex:
+    """Positions of the values of one lazy section in the log.
+
+    The checkpointed part is three sorted parallel arrays searched with bisect, so
+    loading it is a copy of bytes. Changes made since the checkpoint are kept in
+    ``overlay``, where :obj:`None` marks a deleted key.
+    """
+
+    __slots__ = ("keys", "offsets", "lengths", "overlay", "live")
+
+    def __init__(self) -> None:
+        self.keys = array("q")
+        self.offsets = array("q")
+        self.lengths = array("Q")
+        self.overlay: Dict[int, Optional[Location]] = {}
+        self.live = 0
+
+    def get(self, key: int) -> Optional[Location]:
+        if key in self.overlay:
+            return self.overlay[key]
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.offsets[index], self.lengths[index]
+        return None
+
+    def set(self, key: int, location: Optional[Location]) -> None:
+        self.live += (location is not None) - (self.get(key) is not None)
+        self.overlay[key] = location
+
+    def items(self) -> List[Tuple[int, int, int]]:
+        """All live keys with their locations, sorted by key."""
+        merged = dict(zip(self.keys, zip(self.offsets, self.lengths)))
+        for key, location in self.overlay.items():
+            if location is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = location
+        return [(key, *merged[key]) for key in sorted(merged)]
+
+    @classmethod
+    def from_items(cls, items: List[Tuple[int, int, int]]) -> "_KeyIndex":
+        index = cls()
+        for key, offset, length in items:
+            index.keys.append(key)
+            index.offsets.append(offset)
+            index.lengths.append(length)
+        index.live = len(items)
+        return index
+
+    def to_bytes(self) -> bytes:
+        return (
+            INDEX_COUNT.pack(len(self.keys))
+            + self.keys.tobytes()
+            + self.offsets.tobytes()
+            + self.lengths.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, content: bytes, offset: int) -> Tuple["_KeyIndex", int]:
+        (count,) = INDEX_COUNT.unpack_from(content, offset)
+        offset += INDEX_COUNT.size
+        index = cls()
+        for column in (index.keys, index.offsets, index.lengths):
+            end = offset + count * column.itemsize
+            column.frombytes(content[offset:end])
+            offset = end
+        index.live = count
+        return index, offset
+
+
+class LogPersistence(BasePersistence[Dict[Any, Any], Dict[Any, Any], Dict[Any, Any]]):
+    """Persistence backed by an append-only log of changed keys.
+
+    Values are kept in memory in their pickled form. This makes the "did it change?"
+    check a byte comparison and lets compaction write the state without pickling it
+    again. In lazy mode ``user_data`` and ``chat_data`` values stay on disk and only a
+    digest of the loaded ones is kept for that check.
+
+    Args:
+        filepath (:obj:`str` | :obj:`pathlib.Path`): The log file.
+        store_data (:class:`telegram.ext.PersistenceInput`, optional): Which kinds of data
+            to store. Defaults to all.
+        update_interval (:obj:`int` | :obj:`float`, optional): Seconds between the
+            application's persistence updates. Defaults to ``60``.
+        compact_ratio (:obj:`float`, optional): Compact once the log holds this many
+            records per live key. Defaults to ``4``.
+        compact_min_records (:obj:`int`, optional): Never compact a log shorter than this.
+            Defaults to ``1000``.
+        context_types (:class:`telegram.ext.ContextTypes`, optional): Used to create an
+            empty ``bot_data``.
+        lazy (:obj:`bool`, optional): Load ``user_data`` and ``chat_data`` on demand
+            through :meth:`load_user_data` and :meth:`load_chat_data` instead of at
+            startup. Use together with :class:`LazyDataApplication`. Defaults to
+            :obj:`False`.
+    """
+
+    def __init__(
+        self,
+        filepath: Union[str, Path],
+        store_data: Optional[PersistenceInput] = None,
+        update_interval: float = 60,
+        compact_ratio: float = 4.0,
+        compact_min_records: int = 1000,
+        context_types: Optional[ContextTypes] = None,
+        lazy: bool = False,
+    ):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.filepath = Path(filepath)
+        self.index_path = self.filepath.with_name(self.filepath.name + ".idx")
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self.context_types = context_types or ContextTypes()
+        self.lazy = lazy
+        self._sections: Dict[int, Dict[Hashable, bytes]] = {
+            section: {}
+            for section in (USER_DATA, CHAT_DATA, BOT_DATA, CALLBACK_DATA, CONVERSATIONS)
+        }
+        self._indexes: Dict[int, _KeyIndex] = {section: _KeyIndex() for section in LAZY_SECTIONS}
+        self._digests: Dict[int, Dict[int, bytes]] = {section: {} for section in LAZY_SECTIONS}
+        self._log: Optional[BinaryIO] = None
+        self._reader: Optional[BinaryIO] = None
+        self._loaded = False
+        self._log_size = 0
+        self._log_records = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def live_keys(self) -> int:
+        """:obj:`int`: The number of keys currently stored."""
+        return sum(len(section) for section in self._sections.values()) + sum(
+            index.live for index in self._indexes.values()
+        )
+
+    @property
+    def log_records(self) -> int:
+        """:obj:`int`: The number of records in the log, including superseded ones."""
+        return self._log_records
+
+    def _is_lazy(self, section: int) -> bool:
+        return self.lazy and section in LAZY_SECTIONS
+
+    # Loading
+
+    def _open(self) -> None:
+        if self._log is not None:
+            return
+        if self._loaded:
+            self._log = self.filepath.open("ab")
+            self._reader = self.filepath.open("rb")
+            return
+
+        start = self._load_index() if self.lazy else 0
+        valid_length = start
+        if self.filepath.exists():
+            with self.filepath.open("rb") as file:
+                file.seek(start)
+                content = file.read()
+            end = 0
+            for end, section, operation, key, value_offset, value in self._replay(content):
+                self._apply(section, operation, key, value, start + value_offset)
+                self._log_records += 1
+            valid_length = start + end
+            if end < len(content):
+                logger.warning(
+                    "Discarding %d bytes of an incomplete record at the end of %s",
+                    len(content) - end,
+                    self.filepath,
+                )
+        self._loaded = True
+        self._log = self.filepath.open("ab")
+        self._log.truncate(valid_length)
+        self._log_size = valid_length
+        self._reader = self.filepath.open("rb")
+
+    def _apply(
+        self, section: int, operation: int, key: Hashable, value: bytes, offset: int
+    ) -> None:
+        if self._is_lazy(section):
+            self._indexes[section].set(
+                key, (offset, len(value)) if operation == OPERATION_SET else None
+            )
+        elif operation == OPERATION_SET:
+            self._sections[section][key] = value
+        else:
+            self._sections[section].pop(key, None)
+
+    @staticmethod
+    def _replay(content: bytes) -> Iterator[Tuple[int, int, int, Hashable, int, bytes]]:
+        """Yields ``(end, section, operation, key, value offset, value)`` for each complete
+        record. Offsets are relative to the start of ``content``.
+        """
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(content):
+            section, operation, key_length, value_length = RECORD_HEADER.unpack_from(
+                content, offset
+            )
+            start = offset + RECORD_HEADER.size
+            end = start + key_length + value_length
+            if end > len(content):
+                return
+            key = pickle.loads(content[start : start + key_length])
+            value_offset = start + key_length
+            yield end, section, operation, key, value_offset, content[value_offset:end]
+            offset = end
+
+    def _load_index(self) -> int:
+        """Loads the index file if it matches the log and returns the log length it covers."""
+        if not self.index_path.exists() or not self.filepath.exists():
+            return 0
+        content = self.index_path.read_bytes()
+        if len(content) < INDEX_HEADER.size:
+            return 0
+        magic, version, inode, covered, records, eager_length = INDEX_HEADER.unpack_from(content)
+        log_stat = self.filepath.stat()
+        if (
+            magic != INDEX_MAGIC
+            or version != INDEX_VERSION
+            or inode != log_stat.st_ino
+            or covered > log_stat.st_size
+        ):
+            logger.warning("Ignoring stale index %s, reading the whole log", self.index_path)
+            return 0
+
+        offset = INDEX_HEADER.size
+        eager = content[offset : offset + eager_length]
+        for _, section, operation, key, _, value in self._replay(eager):
+            self._apply(section, operation, key, value, 0)
+        offset += eager_length
+        for section in LAZY_SECTIONS:
+            self._indexes[section], offset = _KeyIndex.from_bytes(content, offset)
+        self._log_records = records
+        return covered
+
+    def _load_section(self, section: int) -> Dict[Hashable, Any]:
+        self._open()
+        return {key: pickle.loads(value) for key, value in self._sections[section].items()}
+
+    def _load_value(self, section: int, key: int) -> Optional[Any]:
+        self._open()
+        if not self._is_lazy(section):
+            value = self._sections[section].get(key)
+            return None if value is None else pickle.loads(value)
+        location = self._indexes[section].get(key)
+        if location is None:
+            return None
+        offset, length = location
+        self._reader.seek(offset)
+        value = self._reader.read(length)
+        self._digests[section][key] = self._digest(value)
+        return pickle.loads(value)
+
+    def load_user_data(self, user_id: int) -> Optional[Dict[Any, Any]]:
+        """Reads the stored ``user_data`` of ``user_id``, or returns :obj:`None`."""
+        return self._load_value(USER_DATA, user_id)
+
+    def load_chat_data(self, chat_id: int) -> Optional[Dict[Any, Any]]:
+        """Reads the stored ``chat_data`` of ``chat_id``, or returns :obj:`None`."""
+        return self._load_value(CHAT_DATA, chat_id)
+
+    def forget_user_data(self, user_id: int) -> None:
+        """Drops what is kept in memory about ``user_data`` of ``user_id`` evicted from the
+        application. The stored value is not affected.
+        """
+        self._digests[USER_DATA].pop(user_id, None)
+
+    def forget_chat_data(self, chat_id: int) -> None:
+        """Drops what is kept in memory about ``chat_data`` of ``chat_id`` evicted from the
+        application. The stored value is not affected.
+        """
+        self._digests[CHAT_DATA].pop(chat_id, None)
+
+    # Writing
+
+    @staticmethod
+    def _digest(value: bytes) -> bytes:
+        return hashlib.blake2b(value, digest_size=16).digest()
+
+    @staticmethod
+    def _encode(section: int, operation: int, key: Hashable, value: bytes) -> bytes:
+        key_bytes = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        return (
+            RECORD_HEADER.pack(section, operation, len(key_bytes), len(value))
+            + key_bytes
+            + value
+        )
+
+    async def _set(self, section: int, key: Hashable, data: object) -> None:
+        value = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._is_lazy(section):
+            digest = self._digest(value)
+            if self._digests[section].get(key) == digest:
+                return
+        elif self._sections[section].get(key) == value:
+            return
+        async with self._lock:
+            self._open()
+            offset = self._append(self._encode(section, OPERATION_SET, key, value), len(value))
+            if self._is_lazy(section):
+                self._indexes[section].set(key, (offset, len(value)))
+                self._digests[section][key] = digest
+            else:
+                self._sections[section][key] = value
+        await self._maybe_compact()
+
+    async def _delete(self, section: int, key: Hashable) -> None:
+        async with self._lock:
+            self._open()
+            if self._is_lazy(section):
+                if self._indexes[section].get(key) is None:
+                    return
+                self._indexes[section].set(key, None)
+                self._digests[section].pop(key, None)
+            elif self._sections[section].pop(key, None) is None:
+                return
+            self._append(self._encode(section, OPERATION_DELETE, key, b""), 0)
+        await self._maybe_compact()
+
+    def _append(self, record: bytes, value_length: int) -> int:
+        """Writes ``record`` and returns the offset of its value in the log."""
+        self._log.write(record)
+        self._log.flush()
+        self._log_size += len(record)
+        self._log_records += 1
+        return self._log_size - value_length
+
+    async def _maybe_compact(self) -> None:
+        if self._log_records < self.compact_min_records:
+            return
+        if self._log_records < self.compact_ratio * max(1, self.live_keys):
+            return
+        await self.compact()
+
+    async def compact(self) -> None:
+        """Rewrites the log so that it holds exactly one record per live key.
+
+        The new log is written in a worker thread and then atomically replaces the old
+        one. Changes made meanwhile wait for the compaction to finish. Values loaded
+        meanwhile are read from the old log: its files stay open, and are swapped for the
+        new ones together with the positions, with no await in between.
+        """
+        async with self._lock:
+            self._open()
+            records = self._eager_records()
+            lazy_items = {section: self._indexes[section].items() for section in LAZY_SECTIONS}
+            indexes, count = await asyncio.to_thread(self._write_compacted, records, lazy_items)
+            logger.debug(
+                "Compacted %s from %d to %d records", self.filepath, self._log_records, count
+            )
+            self._close_files()
+            self._indexes.update(indexes)
+            self._log_records = count
+            self._log_size = self.filepath.stat().st_size
+            if self.lazy:
+                self._write_index(records)
+            self._open()
+
+    def _eager_records(self) -> List[bytes]:
+        return [
+            self._encode(section, OPERATION_SET, key, value)
+            for section, entries in self._sections.items()
+            for key, value in entries.items()
+        ]
+
+    def _write_compacted(
+        self, records: List[bytes], lazy_items: Dict[int, List[Tuple[int, int, int]]]
+    ) -> Tuple[Dict[int, _KeyIndex], int]:
+        temporary = self.filepath.with_name(self.filepath.name + ".tmp")
+        indexes = {}
+        count = len(records)
+        with temporary.open("wb") as file, self.filepath.open("rb") as old:
+            file.writelines(records)
+            position = sum(len(record) for record in records)
+            for section, items in lazy_items.items():
+                moved = []
+                for key, offset, length in items:
+                    old.seek(offset)
+                    record = self._encode(section, OPERATION_SET, key, old.read(length))
+                    file.write(record)
+                    position += len(record)
+                    moved.append((key, position - length, length))
+                indexes[section] = _KeyIndex.from_items(moved)
+                count += len(moved)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.filepath)
+        return indexes, count
+
+    def _write_index(self, records: List[bytes]) -> None:
+        """Checkpoints the lazy sections' positions and the eagerly loaded records."""
+        eager = b"".join(records)
+        sections = []
+        for section in LAZY_SECTIONS:
+            index = self._indexes[section]
+            if index.overlay:
+                index = self._indexes[section] = _KeyIndex.from_items(index.items())
+            sections.append(index.to_bytes())
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            INDEX_VERSION,
+            self.filepath.stat().st_ino,
+            self._log_size,
+            self._log_records,
+            len(eager),
+        )
+        temporary = self.index_path.with_name(self.index_path.name + ".tmp")
+        with temporary.open("wb") as file:
+            file.write(header)
+            file.write(eager)
+            file.writelines(sections)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.index_path)
+
+    def _close_files(self) -> None:
+        for file in (self._log, self._reader):
+            if file is not None:
+                file.close()
+        self._log = self._reader = None
+
+    # BasePersistence interface
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        """Returns the stored ``user_data``, or nothing in lazy mode."""
+        return self._load_section(USER_DATA)
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        """Returns the stored ``chat_data``, or nothing in lazy mode."""
+        return self._load_section(CHAT_DATA)
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        """Returns the stored ``bot_data`` or an empty one."""
+        data = self._load_section(BOT_DATA)
+        return data[None] if None in data else self.context_types.bot_data()
+
+    async def get_callback_data(self) -> Optional[CDCData]:
+        """Returns the stored callback data or :obj:`None`."""
+        return self._load_section(CALLBACK_DATA).get(None)
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        """Returns the stored states of the conversation handler ``name``."""
+        return {
+            key: state
+            for (handler_name, key), state in self._load_section(CONVERSATIONS).items()
+            if handler_name == name
+        }
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        """Appends ``data`` to the log if it changed."""
+        await self._set(USER_DATA, user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        """Appends ``data`` to the log if it changed."""
+        await self._set(CHAT_DATA, chat_id, data)
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        """Appends ``data`` to the log if it changed."""
+        await self._set(BOT_DATA, None, data)
+
+    async def update_callback_data(self, data: CDCData) -> None:
+        """Appends ``data`` to the log if it changed."""
+        await self._set(CALLBACK_DATA, None, data)
+
+    async def update_conversation(
+        self, name: str, key: ConversationKey, new_state: Optional[object]
+    ) -> None:
+        """Appends the new state to the log, or removes the key if the conversation ended."""
+        if new_state is None:
+            await self._delete(CONVERSATIONS, (name, key))
+        else:
+            await self._set(CONVERSATIONS, (name, key), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Removes ``user_data`` of ``user_id``."""
+        await self._delete(USER_DATA, user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """Removes ``chat_data`` of ``chat_id``."""
+        await self._delete(CHAT_DATA, chat_id)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        """Does nothing: the data in memory is always current."""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        """Does nothing: the data in memory is always current."""
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        """Does nothing: the data in memory is always current."""
+
+    async def flush(self) -> None:
+        """Compacts the log if it grew large, syncs it to disk and closes it. In lazy mode
+        also checkpoints the index, so the next start reads neither the log nor the values.
+        """
+        await self._maybe_compact()
+        async with self._lock:
+            if self._log is None:
+                return
+            os.fsync(self._log.fileno())
+            if self.lazy:
+                self._write_index(self._eager_records())
+            self._close_files()
+
+
+class LazyDataDict(OrderedDict):
+    """A mapping for ``user_data`` or ``chat_data`` that loads entries on first access
+    and keeps at most ``maxsize`` of them, evicting the least recently used.
+
+    An entry is evicted only if ``is_pinned`` returns :obj:`False` for it and it was not
+    accessed during the last ``min_idle`` seconds, so neither unsaved changes nor data a
+    running handler still holds are lost.
+
+    Args:
+        factory (:obj:`callable`): Creates the value for a key that has no stored data.
+        loader (:obj:`callable`): Returns the stored value for a key or :obj:`None`.
+        maxsize (:obj:`int`): The number of entries to keep in memory.
+        min_idle (:obj:`float`): Entries accessed more recently than this are kept.
+        is_pinned (:obj:`callable`): Returns :obj:`True` for keys that must be kept.
+        on_evict (:obj:`callable`): Called with each evicted key.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        loader: Callable[[int], Optional[Any]],
+        maxsize: int,
+        min_idle: float,
+        is_pinned: Callable[[int], bool],
+        on_evict: Callable[[int], None],
+    ):
+        super().__init__()
+        self.factory = factory
+        self.loader = loader
+        self.maxsize = maxsize
+        self.min_idle = min_idle
+        self.is_pinned = is_pinned
+        self.on_evict = on_evict
+        self.loads = 0
+        self.evictions = 0
+        self._accessed: Dict[int, float] = {}
+
+    def __missing__(self, key: int) -> Any:
+        value = self.loader(key)
+        self.loads += 1
+        if value is None:
+            value = self.factory()
+        self[key] = value
+        self.trim(keep=key)
+        return value
+
+    def __getitem__(self, key: int) -> Any:
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        self._accessed[key] = time.monotonic()
+        return value
+
+    def __delitem__(self, key: int) -> None:
+        super().__delitem__(key)
+        self._accessed.pop(key, None)
+
+    def pop(self, key: int, *args: Any) -> Any:
+        self._accessed.pop(key, None)
+        return super().pop(key, *args)
+
+    def trim(self, keep: Optional[int] = None) -> None:
+        """Evicts the least recently used entries that are over ``maxsize``, except ``keep``."""
+        excess = len(self) - self.maxsize
+        if excess <= 0:
+            return
+        idle_before = time.monotonic() - self.min_idle
+        evicted = []
+        for key in self:
+            if len(evicted) == excess or self._accessed.get(key, 0.0) > idle_before:
+                break
+            if key != keep and not self.is_pinned(key):
+                evicted.append(key)
+        for key in evicted:
+            del self[key]
+            self.on_evict(key)
+        self.evictions += len(evicted)
+
+
+class LazyDataApplication(Application):
+    """An :class:`telegram.ext.Application` whose ``user_data`` and ``chat_data`` are
+    loaded from a lazy :class:`LogPersistence` on first access and evicted when idle.
+
+    Pass it to :meth:`telegram.ext.ApplicationBuilder.application_class`. Entries with
+    changes not yet written are kept until the next persistence update writes them.
+
+    Args:
+        max_user_data (:obj:`int`, optional): ``user_data`` entries kept in memory.
+            Defaults to ``10000``.
+        max_chat_data (:obj:`int`, optional): ``chat_data`` entries kept in memory.
+            Defaults to ``10000``.
+        min_idle (:obj:`float`, optional): Seconds since the last access before an entry
+            may be evicted. Defaults to ``60``.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        max_user_data: int = 10000,
+        max_chat_data: int = 10000,
+        min_idle: float = 60,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        if not isinstance(self.persistence, LogPersistence):
+            raise TypeError("LazyDataApplication requires a LogPersistence")
+        persistence = self.persistence
+        self._user_data = LazyDataDict(
+            self.context_types.user_data,
+            persistence.load_user_data,
+            max_user_data,
+            min_idle,
+            lambda user_id: user_id in self._user_ids_to_be_updated_in_persistence,
+            persistence.forget_user_data,
+        )
+        self._chat_data = LazyDataDict(
+            self.context_types.chat_data,
+            persistence.load_chat_data,
+            max_chat_data,
+            min_idle,
+            lambda chat_id: chat_id in self._chat_ids_to_be_updated_in_persistence,
+            persistence.forget_chat_data,
+        )
+        self.user_data = MappingProxyType(self._user_data)
+        self.chat_data = MappingProxyType(self._chat_data)
+
+    async def update_persistence(self) -> None:
+        """Writes the changed data and then evicts the entries it made evictable."""
+        await super().update_persistence()
+        self._user_data.trim()
+        self._chat_data.trim()
@@ -15,6 +15,7 @@ To use Telegram Passport, you must install PTB via
 `pip install "python-telegram-bot[passport]"`
 """
 import logging
+import os
 from pathlib import Path
 
 from telegram import Update
@@ -31,6 +32,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 
 async def msg(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Downloads and prints the received passport data."""
@@ -112,7 +116,11 @@ def main() -> None:
     # Create the Application and pass it your token and private key
     private_key = Path("private.key")
     application = (
-        Application.builder().token("TOKEN").private_key(private_key.read_bytes()).build()
+        Application.builder()
+        .token("TOKEN")
+        .base_url(TELEGRAM_API_URL)
+        .private_key(private_key.read_bytes())
+        .build()
     )
 
     # On messages that include passport data call msg
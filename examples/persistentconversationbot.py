@@ -15,6 +15,7 @@ bot.
 """
 
 import logging
+import os
 from typing import Dict
 
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
@@ -24,10 +25,11 @@ from telegram.ext import (
     ContextTypes,
     ConversationHandler,
     MessageHandler,
-    PicklePersistence,
     filters,
 )
 
+from logpersistence import LazyDataApplication, LogPersistence
+
 # Enable logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -37,6 +39,9 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 CHOOSING, TYPING_REPLY, TYPING_CHOICE = range(3)
 
 reply_keyboard = [
@@ -134,8 +139,18 @@ async def done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 def main() -> None:
     """Run the bot."""
     # Create the Application and pass it your bot's token.
-    persistence = PicklePersistence(filepath="conversationbot")
-    application = Application.builder().token("TOKEN").persistence(persistence).build()
+    # LogPersistence (see logpersistence.py) appends only the changed keys to a log file.
+    # In lazy mode user_data is read on first access and idle entries are evicted, so
+    # startup time and memory depend on the active users, not on all users ever seen.
+    persistence = LogPersistence(filepath="conversationbot.log", lazy=True)
+    application = (
+        Application.builder()
+        .token("TOKEN")
+        .base_url(TELEGRAM_API_URL)
+        .persistence(persistence)
+        .application_class(LazyDataApplication, kwargs={"max_user_data": 10000})
+        .build()
+    )
 
     # Add conversation handler with the states CHOOSING, TYPING_CHOICE and TYPING_REPLY
     conv_handler = ConversationHandler(
@@ -8,6 +8,7 @@ This program is dedicated to the public domain under the CC0 license.
 import asyncio
 import contextlib
 import logging
+import os
 from typing import NoReturn
 
 from telegram import Bot, Update
@@ -21,11 +22,14 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Bot API endpoint. Set TELEGRAM_API_URL to point the bot at a local stand-in server.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
 
 async def main() -> NoReturn:
     """Run the bot."""
     # Here we use the `async with` syntax to properly initialize and shutdown resources.
-    async with Bot("TOKEN") as bot:
+    async with Bot("TOKEN", base_url=TELEGRAM_API_URL) as bot:
         # get the first pending update_id, this is so we can skip over it in case
         # we get a "Forbidden" exception.
         try:
@@ -0,0 +1,41 @@
+import json
+from typing import Dict
+
+from telegram import InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+# Типы клавиатур, которые можно зарегистрировать
+Markup = (InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove)
+
+
+# Реестр статических клавиатур.
+# Клавиатура строится один раз при регистрации и сразу сериализуется в JSON.
+# Bot API принимает reply_markup как JSON-строку, а PTB передаёт строки как есть,
+# поэтому при отправке не создаются объекты и не повторяется json.dumps.
+class KeyboardRegistry:
+    def __init__(self) -> None:
+        self._markups: Dict[str, object] = {}
+        self._serialized: Dict[str, str] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._markups
+
+    # Регистрация клавиатуры. Объекты PTB неизменяемы после создания,
+    # так что сериализованная форма не может разойтись с объектом.
+    def register(self, name: str, markup: object) -> str:
+        if not isinstance(markup, Markup):
+            raise TypeError(f"Неподдерживаемый тип клавиатуры: {type(markup).__name__}")
+        if name in self._markups:
+            raise ValueError(f"Клавиатура {name} уже зарегистрирована")
+        self._markups[name] = markup
+        self._serialized[name] = json.dumps(
+            markup.to_dict(), ensure_ascii=False, separators=(",", ":")
+        )
+        return self._serialized[name]
+
+    # Объект клавиатуры (например, чтобы сравнить с reply_markup сообщения)
+    def markup(self, name: str) -> object:
+        return self._markups[name]
+
+    # Готовая JSON-строка для параметра reply_markup
+    def __getitem__(self, name: str) -> str:
+        return self._serialized[name]
@@ -0,0 +1,139 @@
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from request_store import SIDE_BUY, SIDE_SELL, STATUS_FILLED, STATUS_OPEN, ExchangeRequest
+
+# Остаток меньше этого считается нулевым: суммы хранятся в float
+EPSILON = 1e-9
+
+
+# Каждая пара торгуется в одном направлении: base раньше quote в порядке currencies.
+# Заявка в обратном направлении - та же сделка с другой стороны: покупка amount base
+# по price quote равна продаже amount * price quote по 1 / price base. Без приведения
+# встречные заявки USD/RUB и RUB/USD попадали бы в разные книги и не сопоставлялись.
+def canonical_order(
+    side: str, base: str, quote: str, amount: float, price: float, currencies: Sequence[str]
+) -> Tuple[str, str, str, float, float]:
+    if currencies.index(base) < currencies.index(quote):
+        return side, base, quote, amount, price
+    opposite = SIDE_SELL if side == SIDE_BUY else SIDE_BUY
+    return opposite, quote, base, amount * price, 1 / price
+
+
+# Сделка: покупатель и продавец, объём в base и цена в quote за единицу base
+class Fill:
+    __slots__ = ("buy", "sell", "amount", "price", "created_at")
+
+    def __init__(
+        self, buy: ExchangeRequest, sell: ExchangeRequest, amount: float, price: float
+    ) -> None:
+        self.buy = buy
+        self.sell = sell
+        self.amount = amount
+        self.price = price
+        self.created_at = time.time()
+
+
+# Книга заявок одной валютной пары с приоритетом цена-время.
+# Покупки лежат в куче по (-цена, id), продажи - по (цена, id): лучшая заявка
+# всегда на вершине, новая заявка добавляется за O(log n). Исполненные и отменённые
+# заявки не удаляются из середины кучи, а пропускаются, когда оказываются на вершине.
+class OrderBook:
+    def __init__(self, base: str, quote: str) -> None:
+        self.base = base
+        self.quote = quote
+        self._bids: List[Tuple[float, int, ExchangeRequest]] = []
+        self._asks: List[Tuple[float, int, ExchangeRequest]] = []
+
+    def __len__(self) -> int:
+        return len(self._bids) + len(self._asks)
+
+    # Лучшая встречная заявка, неактуальные снимаются с вершины
+    def _best(self, heap: List[Tuple[float, int, ExchangeRequest]]) -> Optional[ExchangeRequest]:
+        while heap:
+            request = heap[0][2]
+            if request.status == STATUS_OPEN and request.remaining > EPSILON:
+                return request
+            heapq.heappop(heap)
+        return None
+
+    def best_bid(self) -> Optional[ExchangeRequest]:
+        return self._best(self._bids)
+
+    def best_ask(self) -> Optional[ExchangeRequest]:
+        return self._best(self._asks)
+
+    # Постановка заявки в книгу без сопоставления (восстановление при запуске)
+    def add(self, request: ExchangeRequest) -> None:
+        if request.side == SIDE_BUY:
+            heapq.heappush(self._bids, (-request.price, request.id, request))
+        else:
+            heapq.heappush(self._asks, (request.price, request.id, request))
+
+    # Сопоставление новой заявки со встречными. Сделка идёт по цене заявки,
+    # стоявшей в книге; неисполненный остаток новой заявки остаётся в книге.
+    # Заявки того же пользователя пропускаются: на время сопоставления они снимаются
+    # с кучи, чтобы не закрывать лучшие заявки других пользователей, и затем возвращаются.
+    def match(self, request: ExchangeRequest) -> List[Fill]:
+        fills = []
+        is_buy = request.side == SIDE_BUY
+        heap = self._asks if is_buy else self._bids
+        own: List[Tuple[float, int, ExchangeRequest]] = []
+        while request.remaining > EPSILON:
+            resting = self._best(heap)
+            if resting is None:
+                break
+            if is_buy and resting.price > request.price:
+                break
+            if not is_buy and resting.price < request.price:
+                break
+            if resting.user_id == request.user_id:
+                own.append(heapq.heappop(heap))
+                continue
+
+            amount = min(request.remaining, resting.remaining)
+            for side in (request, resting):
+                side.filled += amount
+                if side.remaining <= EPSILON:
+                    side.filled = side.amount
+                    side.status = STATUS_FILLED
+            if is_buy:
+                fills.append(Fill(request, resting, amount, resting.price))
+            else:
+                fills.append(Fill(resting, request, amount, resting.price))
+
+        for entry in own:
+            heapq.heappush(heap, entry)
+        if request.status == STATUS_OPEN:
+            self.add(request)
+        return fills
+
+
+# Книги заявок по валютным парам
+class OrderBooks:
+    def __init__(self) -> None:
+        self._books: Dict[Tuple[str, str], OrderBook] = {}
+
+    def book(self, base: str, quote: str) -> OrderBook:
+        book = self._books.get((base, quote))
+        if book is None:
+            book = self._books[(base, quote)] = OrderBook(base, quote)
+        return book
+
+    # Новая заявка: сделки с уже стоящими заявками той же пары
+    def match(self, request: ExchangeRequest) -> List[Fill]:
+        return self.book(request.base, request.quote).match(request)
+
+    # Восстановление книг из открытых заявок
+    def load(self, requests: Iterable[ExchangeRequest]) -> int:
+        self._books.clear()
+        count = 0
+        for request in requests:
+            self.book(request.base, request.quote).add(request)
+            count += 1
+        return count
+
+    # Число заявок в книгах по парам (включая ещё не снятые исполненные)
+    def stats(self) -> Dict[str, int]:
+        return {f"{base}/{quote}": len(book) for (base, quote), book in self._books.items()}
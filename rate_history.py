@@ -0,0 +1,129 @@
+import logging
+import math
+import os
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Tuple
+
+from rates import RateMatrix
+
+logger = logging.getLogger(__name__)
+
+# Длительность периода по суффиксу: минуты, часы, дни, недели, годы
+PERIOD_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+
+PERIOD_PATTERN = re.compile(r"^(\d+)([mhdwy])$")
+
+
+# Разбор периода вида "30m", "12h", "7d", "4w", "1y" в секунды
+def parse_period(text: str) -> Optional[int]:
+    match = PERIOD_PATTERN.match(text.lower())
+    if match is None:
+        return None
+    return int(match.group(1)) * PERIOD_UNITS[match.group(2)]
+
+
+# Статистика курса пары за период
+class HistoryStats:
+    def __init__(
+        self, count: int, first: float, last: float, low: float, high: float, mean: float
+    ) -> None:
+        self.count = count
+        self.first = first
+        self.last = last
+        self.low = low
+        self.high = high
+        self.mean = mean
+
+    # Изменение за период в процентах
+    @property
+    def change(self) -> float:
+        return (self.last / self.first - 1.0) * 100.0
+
+
+# Колоночное хранилище истории курсов.
+# На диске: timestamps.bin (время обновления API, float64) и по файлу <КОД>.bin
+# на валюту (курс относительно базы снимка, float64), все файлы только дописываются.
+# В памяти те же колонки лежат плотными массивами: год с минутным шагом -
+# около 4 МБ на валюту. Курсы пары считаются из колонок base и quote.
+class RateHistory:
+    def __init__(self, directory: str, currencies: Iterable[str]) -> None:
+        self.directory = directory
+        self.currencies = tuple(currencies)
+        self.timestamps = array("d")
+        self.columns: Dict[str, array] = {code: array("d") for code in self.currencies}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+
+    # Загрузка колонок с диска. Колонки выравниваются по самой короткой,
+    # чтобы недописанная при падении строка не сдвинула данные.
+    def load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        columns = {"timestamps": self.timestamps, **self.columns}
+        for name, column in columns.items():
+            del column[:]
+            try:
+                with open(self._path(name), "rb") as file:
+                    column.frombytes(file.read())
+            except FileNotFoundError:
+                pass
+
+        rows = min(len(column) for column in columns.values())
+        for name, column in columns.items():
+            if len(column) != rows:
+                logger.warning("История курсов %s обрезана до %s строк", name, rows)
+                del column[rows:]
+                with open(self._path(name), "wb") as file:
+                    column.tofile(file)
+
+    # Добавление снимка в память. Возвращает строку для записи на диск
+    # или None, если снимок не новее последнего сохранённого.
+    def append(self, matrix: RateMatrix) -> Optional[Tuple[float, Dict[str, float]]]:
+        timestamp = matrix.updated_at or matrix.fetched_at
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            return None
+
+        row = {}
+        for code in self.currencies:
+            rate = matrix.rate(matrix.base, code)
+            row[code] = math.nan if rate is None else rate
+            self.columns[code].append(row[code])
+        self.timestamps.append(timestamp)
+        return timestamp, row
+
+    # Дозапись строки в файлы: сначала колонки валют, время последним
+    def write(self, timestamp: float, row: Dict[str, float]) -> None:
+        for code, rate in row.items():
+            with open(self._path(code), "ab") as file:
+                array("d", (rate,)).tofile(file)
+        with open(self._path("timestamps"), "ab") as file:
+            array("d", (timestamp,)).tofile(file)
+
+    # Статистика курса base -> quote начиная с момента since.
+    # Начало периода ищется бинарным поиском, агрегаты считаются по срезам массивов.
+    def stats(self, base: str, quote: str, since: float) -> Optional[HistoryStats]:
+        if base not in self.columns or quote not in self.columns:
+            return None
+        start = bisect_left(self.timestamps, since)
+        series = [
+            rate
+            for rate in map(
+                float.__truediv__, self.columns[quote][start:], self.columns[base][start:]
+            )
+            if not math.isnan(rate)
+        ]
+        if not series:
+            return None
+        return HistoryStats(
+            count=len(series),
+            first=series[0],
+            last=series[-1],
+            low=min(series),
+            high=max(series),
+            mean=math.fsum(series) / len(series),
+        )
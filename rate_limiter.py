@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты очередей: меньше - раньше
+PRIORITY_HIGH = 0  # ответы на нажатия кнопок
+PRIORITY_NORMAL = 1  # ответы пользователям
+PRIORITY_LOW = 2  # рассылки
+
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+# Методы, которые отправляются вне очереди: служебные и long polling
+UNLIMITED_METHODS = frozenset(
+    {"getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "close", "logOut"}
+)
+
+# Методы с высоким приоритетом: пользователь ждёт реакции на нажатие
+HIGH_PRIORITY_METHODS = frozenset({"answerCallbackQuery", "answerInlineQuery"})
+
+# Методы, которые создают новое сообщение в чате: только они учитываются в лимите чата.
+# Правка сообщений и ответы на нажатия идут без ожидания очереди чата.
+CHAT_LIMITED_METHODS = frozenset(
+    {
+        "sendMessage", "sendPhoto", "sendAudio", "sendDocument", "sendVideo", "sendAnimation",
+        "sendVoice", "sendVideoNote", "sendMediaGroup", "sendLocation", "sendVenue",
+        "sendContact", "sendPoll", "sendDice", "sendSticker", "sendInvoice", "sendGame",
+        "forwardMessage", "forwardMessages", "copyMessage", "copyMessages",
+    }
+)
+
+# Лимиты Telegram: ~30 сообщений в секунду всего, 1 в секунду в личный чат,
+# 20 в минуту в группу; короткие всплески до CHAT_BURST сообщений допустимы
+GLOBAL_RATE = 30.0
+PRIVATE_CHAT_INTERVAL = 1.0
+GROUP_CHAT_INTERVAL = 3.0
+CHAT_BURST = 3.0
+
+
+# Корзина токенов: rate токенов в секунду, не больше burst подряд
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Сколько ждать до появления токена (0 - токен есть)
+    def delay(self) -> float:
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    # Резерв токена в долг: сколько ждать своей очереди. Порядок резервов сохраняется.
+    def reserve(self, now: float) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    # Корзина снова полна: её можно забыть без потери лимита
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+# Статистика одной очереди приоритета
+class _LaneStats:
+    __slots__ = ("queued", "sent", "wait_total", "wait_max")
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.sent = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+# Планировщик исходящих запросов к Bot API (точка расширения PTB BaseRateLimiter).
+# Новое сообщение сначала ждёт свою очередь в чате (корзина токенов чата: 1 сообщение
+# в секунду в личный чат, 20 в минуту в группу, всплеск до CHAT_BURST), затем общий
+# токен (GLOBAL_RATE в секунду). Общие токены выдаются по приоритету: ответы на нажатия
+# раньше ответов, ответы раньше рассылок.
+# Приоритет можно задать явно: bot.send_message(..., rate_limit_args=PRIORITY_LOW).
+# Ответ 429 приостанавливает все запросы на retry_after секунд, затем запрос повторяется
+# с новым общим токеном; место в очереди чата при повторе не занимается заново.
+class SendScheduler(BaseRateLimiter[int]):
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_RATE,
+        global_burst: float = GLOBAL_RATE,
+        private_chat_interval: float = PRIVATE_CHAT_INTERVAL,
+        group_chat_interval: float = GROUP_CHAT_INTERVAL,
+        chat_burst: float = CHAT_BURST,
+        max_retries: int = 3,
+    ) -> None:
+        self._bucket = TokenBucket(global_rate, global_burst)
+        self._private_chat_interval = private_chat_interval
+        self._group_chat_interval = group_chat_interval
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        # Корзины токенов чатов, которым недавно отправлялись сообщения
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._lanes = {priority: _LaneStats() for priority in PRIORITY_NAMES}
+        self.retries = 0
+
+    # ExtBot вызывает initialize при каждой инициализации бота (Application и Updater),
+    # поэтому повторный вызов не должен запускать второй цикл выдачи токенов
+    async def initialize(self) -> None:
+        if self._pump_task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def shutdown(self) -> None:
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Any]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Any]]:
+        if endpoint in UNLIMITED_METHODS:
+            return await callback(*args, **kwargs)
+
+        if rate_limit_args is not None:
+            priority = rate_limit_args
+        elif endpoint in HIGH_PRIORITY_METHODS:
+            priority = PRIORITY_HIGH
+        else:
+            priority = PRIORITY_NORMAL
+        chat_id = data.get("chat_id") if endpoint in CHAT_LIMITED_METHODS else None
+        # Очередь чата: место резервируется один раз и сразу, так сообщения чата идут
+        # по порядку, а повтор после 429 не тратит второй токен чата
+        chat_delay = 0.0 if chat_id is None else self._reserve_chat(chat_id, time.monotonic())
+
+        attempt = 0
+        while True:
+            await self._acquire(priority, chat_delay)
+            chat_delay = 0.0
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt == self._max_retries:
+                    logger.warning(
+                        "Лимит Telegram: %s не отправлен после %d повторов", endpoint, attempt
+                    )
+                    raise
+                attempt += 1
+                self.retries += 1
+                self._pause(exc.retry_after)
+                logger.info(
+                    "Лимит Telegram: пауза %s с перед повтором %s", exc.retry_after, endpoint
+                )
+
+    # Пауза всех запросов после ответа 429
+    def _pause(self, retry_after: Union[int, float]) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after + 0.1)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Ожидание своей очереди в чате (уже зарезервированной) и общего токена
+    async def _acquire(self, priority: int, chat_delay: float) -> None:
+        lane = self._lanes.get(priority) or self._lanes[PRIORITY_NORMAL]
+        started = time.monotonic()
+        lane.queued += 1
+        try:
+            if chat_delay > 0:
+                await asyncio.sleep(chat_delay)
+
+            # Общий токен по приоритету
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            if self._wakeup is not None:
+                self._wakeup.set()
+            await future
+        finally:
+            lane.queued -= 1
+        waited = time.monotonic() - started
+        lane.sent += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+
+    def _reserve_chat(self, chat_id: Union[int, str], now: float) -> float:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Чаты, корзины которых уже полны, больше не нужно помнить
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    key: value
+                    for key, value in self._chat_buckets.items()
+                    if not value.is_full(now)
+                }
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            interval = self._group_chat_interval if is_group else self._private_chat_interval
+            bucket = self._chat_buckets[chat_id] = TokenBucket(1 / interval, self._chat_burst)
+        return bucket.reserve(now)
+
+    # Выдача общих токенов ожидающим по приоритету
+    async def _pump(self) -> None:
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            pause = self._paused_until - time.monotonic()
+            delay = max(pause, self._bucket.delay())
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._bucket.take()
+            future.set_result(None)
+
+    # Метрики: глубина очередей и время ожидания по приоритетам
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for priority, lane in self._lanes.items():
+            lanes[PRIORITY_NAMES[priority]] = {
+                "queued": lane.queued,
+                "sent": lane.sent,
+                "wait_avg": lane.wait_total / lane.sent if lane.sent else 0.0,
+                "wait_max": lane.wait_max,
+            }
+        return {
+            "lanes": lanes,
+            "retries": self.retries,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            "tracked_chats": len(self._chat_buckets),
+        }
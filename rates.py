@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Адрес API курсов валют
+RATES_API_URL = "https://open.er-api.com"
+
+# Базовая валюта снимка: по одной таблице курсов считаются все кросс-курсы
+SNAPSHOT_BASE = "USD"
+
+# Время жизни снимка, если API не сообщило время следующего обновления (5 часов)
+DEFAULT_TTL = 18000
+
+# Минимальное время жизни снимка: не чаще одного запроса в минуту,
+# даже если время следующего обновления уже прошло
+MIN_TTL = 60
+
+# Если API ответило 304 после объявленного обновления, проверяем снова через 10 минут
+NOT_MODIFIED_TTL = 600
+
+# Формат файла снимка: сигнатура, версия, число валют, базовая валюта,
+# время получения, время обновления и следующего обновления API (NaN, если неизвестно)
+SNAPSHOT_MAGIC = b"RATE"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHI3sddd")
+
+# Таймауты: соединение 5 секунд, чтение ответа 10 секунд
+RATES_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+# Пул соединений: держим keep-alive соединения, чтобы не открывать TLS на каждый запрос
+RATES_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+
+# Асинхронный клиент API курсов валют.
+# Один пул соединений на всё приложение: открывается в post_init и закрывается в post_shutdown.
+class RateClient:
+    def __init__(self, base_url: str = RATES_API_URL) -> None:
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=RATES_TIMEOUT, limits=RATES_LIMITS
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # Запрос снимка курсов относительно базовой валюты.
+    # Если передан предыдущий снимок, запрос условный (If-None-Match / If-Modified-Since):
+    # на ответ 304 возвращается тот же снимок без повторной загрузки таблицы.
+    # Возвращает None при любой ошибке.
+    async def fetch_snapshot(
+        self, base_currency: str, previous: Optional["RateMatrix"] = None
+    ) -> Optional["RateMatrix"]:
+        if self._client is None:
+            await self.start()
+
+        headers = {}
+        if previous is not None and previous.base == base_currency:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+
+        try:
+            response = await self._client.get(f"/v6/latest/{base_currency}", headers=headers)
+            if response.status_code == httpx.codes.NOT_MODIFIED and previous is not None:
+                previous.revalidated()
+                return previous
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("Не удалось получить курс %s: %s", base_currency, e)
+            return None
+
+        # Ответ неожиданной формы ("rates": null, не объект и т.п.) - такая же неудача,
+        # как ошибка сети: исключение не должно прерывать фоновое обновление курсов
+        try:
+            if data.get("result") != "success":
+                logger.warning("API курсов вернуло ошибку для %s: %s", base_currency, data)
+                return None
+            return RateMatrix(
+                base_currency,
+                data["rates"],
+                updated_at=data.get("time_last_update_unix"),
+                next_update_at=data.get("time_next_update_unix"),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            logger.warning("Некорректный ответ API курсов для %s: %r", base_currency, e)
+            return None
+
+
+# Матрица курсов, построенная по одному снимку относительно SNAPSHOT_BASE.
+# Курсы хранятся плотным массивом float64, кросс-курс base -> quote
+# считается как values[quote] / values[base] без обращения к API.
+# Срок годности снимка берётся из расписания API (time_next_update_unix).
+class RateMatrix:
+    def __init__(
+        self,
+        base: str,
+        rates: Dict[str, float],
+        fetched_at: Optional[float] = None,
+        updated_at: Optional[float] = None,
+        next_update_at: Optional[float] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        self.base = base
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.updated_at = updated_at
+        self.next_update_at = next_update_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.codes = tuple(rates)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.values = array("d", (float(rate) for rate in rates.values()))
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.index
+
+    # Размер снимка в памяти: массив курсов, коды валют и индекс
+    def __sizeof__(self) -> int:
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self.values)
+            + sys.getsizeof(self.codes)
+            + sys.getsizeof(self.index)
+            + sum(sys.getsizeof(code) for code in self.codes)
+        )
+
+    # Возраст снимка в секундах
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    # Версия данных снимка: время обновления у API (ответ 304 версию не меняет)
+    @property
+    def version(self) -> float:
+        return self.updated_at or self.fetched_at
+
+    # Момент, после которого у API могут появиться новые данные
+    @property
+    def expires_at(self) -> float:
+        if self.next_update_at is None:
+            return self.fetched_at + DEFAULT_TTL
+        return max(self.next_update_at, self.fetched_at + MIN_TTL)
+
+    @property
+    def is_expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    # Снимок подтверждён ответом 304: данные не изменились
+    def revalidated(self) -> None:
+        self.fetched_at = time.time()
+        if self.next_update_at is None or self.next_update_at <= self.fetched_at:
+            self.next_update_at = self.fetched_at + NOT_MODIFIED_TTL
+
+    # Кросс-курс: сколько quote стоит одна единица base
+    def rate(self, base: str, quote: str) -> Optional[float]:
+        if base not in self.index or quote not in self.index:
+            return None
+        return self.values[self.index[quote]] / self.values[self.index[base]]
+
+    # Строка матрицы: курсы всех (или только перечисленных) валют относительно base
+    def row(self, base: str, quotes: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        if base not in self.index:
+            return {}
+        factor = 1.0 / self.values[self.index[base]]
+        if quotes is None:
+            return {code: value * factor for code, value in zip(self.codes, self.values)}
+        return {
+            code: self.values[self.index[code]] * factor for code in quotes if code in self.index
+        }
+
+
+# Запись снимка в компактный бинарный файл: заголовок, ETag, Last-Modified,
+# коды валют через запятую и массив курсов float64 как есть.
+# Файл пишется во временный и атомарно подменяется, чтобы падение не оставило обрывок.
+def save_snapshot(matrix: RateMatrix, path: str) -> None:
+    def optional(value: Optional[float]) -> float:
+        return math.nan if value is None else value
+
+    def text(value: Optional[str]) -> bytes:
+        data = (value or "").encode("utf-8")
+        return struct.pack("<H", len(data)) + data
+
+    codes = ",".join(matrix.codes).encode("ascii")
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        len(matrix.codes),
+        matrix.base.encode("ascii"),
+        matrix.fetched_at,
+        optional(matrix.updated_at),
+        optional(matrix.next_update_at),
+    )
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(header)
+        file.write(text(matrix.etag))
+        file.write(text(matrix.last_modified))
+        file.write(struct.pack("<I", len(codes)) + codes)
+        matrix.values.tofile(file)
+    os.replace(tmp_path, path)
+
+
+# Чтение снимка, сохранённого save_snapshot.
+# Возвращает None, если файла нет или он повреждён.
+def load_snapshot(path: str) -> Optional[RateMatrix]:
+    def optional(value: float) -> Optional[float]:
+        return None if math.isnan(value) else value
+
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, version, count, base, fetched_at, updated_at, next_update_at = (
+            SNAPSHOT_HEADER.unpack_from(data)
+        )
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            logger.warning("Неизвестный формат файла снимка %s", path)
+            return None
+
+        offset = SNAPSHOT_HEADER.size
+        strings = []
+        for _ in range(2):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            strings.append(data[offset:offset + length].decode("utf-8") or None)
+            offset += length
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        codes = data[offset:offset + length].decode("ascii").split(",")
+        offset += length
+        values = array("d")
+        values.frombytes(data[offset:offset + count * values.itemsize])
+    except FileNotFoundError:
+        return None
+    except (OSError, struct.error, UnicodeDecodeError, ValueError) as e:
+        logger.warning("Не удалось прочитать файл снимка %s: %s", path, e)
+        return None
+
+    if len(codes) != count or len(values) != count:
+        logger.warning("Файл снимка %s повреждён", path)
+        return None
+    return RateMatrix(
+        base.decode("ascii"),
+        dict(zip(codes, values)),
+        fetched_at=fetched_at,
+        updated_at=optional(updated_at),
+        next_update_at=optional(next_update_at),
+        etag=strings[0],
+        last_modified=strings[1],
+    )
+
+
+# Объединение одновременных запросов по одному ключу.
+# Пока запрос по ключу выполняется, остальные вызывающие ждут его результат,
+# а не отправляют свой запрос к API.
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable]) -> object:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(future)
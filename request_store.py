@@ -0,0 +1,254 @@
+import time
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional
+
+from sqlite_store import SQLiteStore
+
+if TYPE_CHECKING:
+    from order_book import Fill
+
+# Статусы заявки
+STATUS_OPEN = "open"
+STATUS_FILLED = "filled"
+STATUS_CANCELLED = "cancelled"
+
+# Стороны заявки
+SIDE_BUY = "buy"
+SIDE_SELL = "sell"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchange_requests (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    side TEXT NOT NULL CHECK (side IN ('buy', 'sell')),
+    base TEXT NOT NULL,
+    quote TEXT NOT NULL,
+    amount REAL NOT NULL CHECK (amount > 0),
+    price REAL NOT NULL CHECK (price > 0),
+    filled REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_requests_user ON exchange_requests (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_requests_status ON exchange_requests (status, id);
+CREATE INDEX IF NOT EXISTS idx_requests_pair ON exchange_requests (base, quote, status, id);
+CREATE INDEX IF NOT EXISTS idx_requests_created ON exchange_requests (created_at);
+CREATE INDEX IF NOT EXISTS idx_requests_user_status ON exchange_requests (user_id, status, id);
+CREATE INDEX IF NOT EXISTS idx_requests_user_base ON exchange_requests (user_id, base, id);
+CREATE INDEX IF NOT EXISTS idx_requests_user_quote ON exchange_requests (user_id, quote, id);
+CREATE INDEX IF NOT EXISTS idx_requests_base ON exchange_requests (base, id);
+CREATE INDEX IF NOT EXISTS idx_requests_quote ON exchange_requests (quote, id);
+CREATE INDEX IF NOT EXISTS idx_requests_user_status_base
+    ON exchange_requests (user_id, status, base, id);
+CREATE INDEX IF NOT EXISTS idx_requests_user_status_quote
+    ON exchange_requests (user_id, status, quote, id);
+CREATE INDEX IF NOT EXISTS idx_requests_status_base ON exchange_requests (status, base, id);
+CREATE INDEX IF NOT EXISTS idx_requests_status_quote ON exchange_requests (status, quote, id);
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    buy_request_id INTEGER NOT NULL REFERENCES exchange_requests (id),
+    sell_request_id INTEGER NOT NULL REFERENCES exchange_requests (id),
+    amount REAL NOT NULL,
+    price REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fills_buy ON fills (buy_request_id);
+CREATE INDEX IF NOT EXISTS idx_fills_sell ON fills (sell_request_id);
+"""
+
+COLUMNS = "id, user_id, chat_id, side, base, quote, amount, price, filled, status, created_at"
+
+
+# Заявка на обмен: купить или продать amount единиц base по цене price в quote
+class ExchangeRequest:
+    __slots__ = (
+        "id", "user_id", "chat_id", "side", "base", "quote",
+        "amount", "price", "filled", "status", "created_at",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        chat_id: int,
+        side: str,
+        base: str,
+        quote: str,
+        amount: float,
+        price: float,
+        filled: float,
+        status: str,
+        created_at: float,
+    ) -> None:
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.side = side
+        self.base = base
+        self.quote = quote
+        self.amount = amount
+        self.price = price
+        self.filled = filled
+        self.status = status
+        self.created_at = created_at
+
+    # Неисполненный остаток заявки
+    @property
+    def remaining(self) -> float:
+        return self.amount - self.filled
+
+
+# Страница списка заявок, новые первыми, и есть ли заявки новее и старше неё
+class RequestPage:
+    __slots__ = ("requests", "has_newer", "has_older")
+
+    def __init__(self, requests: List[ExchangeRequest], has_newer: bool, has_older: bool) -> None:
+        self.requests = requests
+        self.has_newer = has_newer
+        self.has_older = has_older
+
+
+# Хранилище заявок в SQLite (общий рабочий поток и режим WAL - SQLiteStore)
+class RequestStore(SQLiteStore):
+    schema = SCHEMA
+    thread_name = "request_store"
+    title = "Хранилище заявок"
+
+    # Новая заявка
+    async def add_request(
+        self,
+        user_id: int,
+        chat_id: int,
+        side: str,
+        base: str,
+        quote: str,
+        amount: float,
+        price: float,
+    ) -> ExchangeRequest:
+        return await self._run(self._add_request, user_id, chat_id, side, base, quote, amount, price)
+
+    def _add_request(
+        self,
+        user_id: int,
+        chat_id: int,
+        side: str,
+        base: str,
+        quote: str,
+        amount: float,
+        price: float,
+    ) -> ExchangeRequest:
+        created_at = time.time()
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO exchange_requests"
+                " (user_id, chat_id, side, base, quote, amount, price, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, chat_id, side, base, quote, amount, price, created_at),
+            )
+        return ExchangeRequest(
+            cursor.lastrowid, user_id, chat_id, side, base, quote,
+            amount, price, 0.0, STATUS_OPEN, created_at,
+        )
+
+    # Страница заявок с постраничной навигацией по ключу (keyset): курсор - id крайней
+    # заявки соседней страницы, before_id - листать к старым, after_id - к новым.
+    # Фильтры по пользователю, статусу и валюте идут по индексам вида (..., id),
+    # поэтому любая страница читается за одно обращение к индексу, без OFFSET.
+    # Фильтр по валюте находит заявки, где она base или quote: это две выборки по
+    # индексам (..., base, id) и (..., quote, id) не больше страницы каждая, слитые по id.
+    async def page_requests(
+        self,
+        user_id: Optional[int] = None,
+        status: Optional[str] = None,
+        currency: Optional[str] = None,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> RequestPage:
+        return await self._run(
+            self._page_requests, user_id, status, currency, before_id, after_id, limit
+        )
+
+    def _page_requests(
+        self,
+        user_id: Optional[int],
+        status: Optional[str],
+        currency: Optional[str],
+        before_id: Optional[int],
+        after_id: Optional[int],
+        limit: int,
+    ) -> RequestPage:
+        conditions = []
+        parameters: List[Any] = []
+        for column, value in (("user_id", user_id), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if after_id is not None:
+            conditions.append("id > ?")
+            parameters.append(after_id)
+            order = "ASC"
+        else:
+            if before_id is not None:
+                conditions.append("id < ?")
+                parameters.append(before_id)
+            order = "DESC"
+
+        # Одна лишняя строка показывает, есть ли следующая страница
+        if currency is None:
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            query = f"SELECT {COLUMNS} FROM exchange_requests{where} ORDER BY id {order} LIMIT ?"
+            arguments = (*parameters, limit + 1)
+        else:
+            # base и quote заявки различаются, поэтому выборки не пересекаются
+            selects = [
+                f"SELECT * FROM (SELECT {COLUMNS} FROM exchange_requests"
+                f" WHERE {' AND '.join([*conditions, f'{column} = ?'])}"
+                f" ORDER BY id {order} LIMIT ?)"
+                for column in ("base", "quote")
+            ]
+            query = f"{' UNION ALL '.join(selects)} ORDER BY id {order} LIMIT ?"
+            arguments = (
+                *parameters, currency, limit + 1, *parameters, currency, limit + 1, limit + 1
+            )
+        rows = self._connection.execute(query, arguments).fetchall()
+        has_more = len(rows) > limit
+        requests = [ExchangeRequest(*row) for row in rows[:limit]]
+        if after_id is not None:
+            requests.reverse()
+            return RequestPage(requests, has_newer=has_more, has_older=True)
+        return RequestPage(requests, has_newer=before_id is not None, has_older=has_more)
+
+    # Открытые заявки всех пар для восстановления книг заявок (индекс idx_requests_status)
+    async def load_open_requests(self) -> List[ExchangeRequest]:
+        return await self._run(self._load_open_requests)
+
+    def _load_open_requests(self) -> List[ExchangeRequest]:
+        rows = self._connection.execute(
+            f"SELECT {COLUMNS} FROM exchange_requests WHERE status = ? ORDER BY id",
+            (STATUS_OPEN,),
+        ).fetchall()
+        return [ExchangeRequest(*row) for row in rows]
+
+    # Сделки и новое состояние участвовавших заявок - одной транзакцией
+    async def record_fills(self, fills: Iterable["Fill"]) -> None:
+        await self._run(self._record_fills, list(fills))
+
+    def _record_fills(self, fills: List["Fill"]) -> None:
+        requests = {}
+        for fill in fills:
+            requests[fill.buy.id] = fill.buy
+            requests[fill.sell.id] = fill.sell
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO fills (buy_request_id, sell_request_id, amount, price, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (fill.buy.id, fill.sell.id, fill.amount, fill.price, fill.created_at)
+                    for fill in fills
+                ],
+            )
+            self._connection.executemany(
+                "UPDATE exchange_requests SET filled = ?, status = ? WHERE id = ?",
+                [(request.filled, request.status, request.id) for request in requests.values()],
+            )
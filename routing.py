@@ -0,0 +1,117 @@
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseHandler, CallbackContext
+
+from callback_codec import Action, CallbackCodec
+
+# Колбэк обработчика: (update, context) -> результат
+Callback = Callable[[Update, CallbackContext], Awaitable[Any]]
+
+# Колбэк действия кнопки: (update, context, *значения полей) -> результат
+ActionCallback = Callable[..., Awaitable[Any]]
+
+
+# Обработчик кнопок постоянной клавиатуры: точное совпадение текста сообщения
+# с подписью кнопки. Маршруты хранятся в словаре, поэтому проверка обновления -
+# один поиск по словарю, сколько бы кнопок ни было, а не регулярное выражение на каждую.
+# Обработчик регистрируется один раз и вызывает колбэк, соответствующий подписи.
+class ExactTextHandler(BaseHandler[Update, CallbackContext]):
+    __slots__ = ("routes",)
+
+    def __init__(
+        self,
+        routes: Mapping[str, Callback],
+        block: bool = True,
+    ) -> None:
+        super().__init__(self._dispatch, block=block)
+        self.routes: Dict[str, Callback] = dict(routes)
+
+    # Добавление маршрута после создания обработчика
+    def add_route(self, text: str, callback: Callback) -> None:
+        self.routes[text] = callback
+
+    # Возвращает колбэк для подписи кнопки или None, если сообщение не кнопка
+    def check_update(self, update: object) -> Optional[Callback]:
+        if not isinstance(update, Update) or update.message is None:
+            return None
+        text = update.message.text
+        if text is None:
+            return None
+        return self.routes.get(text)
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Any,
+        check_result: Callback,
+        context: CallbackContext,
+    ) -> Any:
+        self.collect_additional_context(context, update, application, check_result)
+        return await check_result(update, context)
+
+    # Прямой вызов handler.callback тоже маршрутизируется по тексту сообщения
+    async def _dispatch(self, update: Update, context: CallbackContext) -> Any:
+        callback = self.check_update(update)
+        if callback is None:
+            return None
+        return await callback(update, context)
+
+
+# Обработчик inline-кнопок с данными из CallbackCodec. Данные разбираются один раз,
+# маршрут выбирается по номеру действия поиском по словарю, а колбэк получает
+# уже разобранные значения полей: (update, context, *значения).
+# Данные других форматов и неизвестные действия обработчик пропускает.
+class CallbackActionHandler(BaseHandler[Update, CallbackContext]):
+    __slots__ = ("codec", "routes")
+
+    def __init__(
+        self,
+        codec: CallbackCodec,
+        routes: Mapping[Action, ActionCallback],
+        block: bool = True,
+    ) -> None:
+        super().__init__(self._dispatch, block=block)
+        self.codec = codec
+        self.routes: Dict[int, ActionCallback] = {
+            action.id: callback for action, callback in routes.items()
+        }
+
+    # Добавление маршрута после создания обработчика
+    def add_route(self, action: Action, callback: ActionCallback) -> None:
+        self.routes[action.id] = callback
+
+    # Возвращает колбэк и значения полей или None, если кнопка не из этого кодека
+    def check_update(self, update: object) -> Optional[Tuple[ActionCallback, List[Any]]]:
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        decoded = self.codec.decode(data)
+        if decoded is None:
+            return None
+        action, values = decoded
+        callback = self.routes.get(action.id)
+        if callback is None:
+            return None
+        return callback, values
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Any,
+        check_result: Tuple[ActionCallback, List[Any]],
+        context: CallbackContext,
+    ) -> Any:
+        self.collect_additional_context(context, update, application, check_result)
+        callback, values = check_result
+        return await callback(update, context, *values)
+
+    # Прямой вызов handler.callback тоже маршрутизируется по данным кнопки
+    async def _dispatch(self, update: Update, context: CallbackContext) -> Any:
+        check_result = self.check_update(update)
+        if check_result is None:
+            return None
+        callback, values = check_result
+        return await callback(update, context, *values)
@@ -0,0 +1,47 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+# Общая основа хранилищ в SQLite (режим WAL).
+# Все обращения к базе идут через один рабочий поток: соединение SQLite не делится
+# между потоками, а цикл событий не блокируется на дисковых операциях.
+# Наследник задаёт схему, имя рабочего потока и название хранилища для ошибок.
+class SQLiteStore:
+    schema = ""
+    thread_name = "sqlite_store"
+    title = "Хранилище"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.thread_name)
+        await self._run(self._open)
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _open(self) -> None:
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(self.schema)
+        self._connection.commit()
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._executor is None:
+            raise RuntimeError(f"{self.title} не открыто")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
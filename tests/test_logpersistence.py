@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples"))
+
+from logpersistence import LogPersistence  # noqa: E402
+
+
+class LoadDuringCompactionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "bot.log")
+
+    async def asyncTearDown(self) -> None:
+        self.directory.cleanup()
+
+    async def test_load_during_compaction_keeps_later_writes(self) -> None:
+        persistence = LogPersistence(self.path, lazy=True)
+        for user_id in range(10):
+            await persistence.update_user_data(user_id, {"value": user_id})
+        for version in range(5):
+            await persistence.update_user_data(5, {"value": 5, "version": version})
+
+        # Compaction is held in its worker thread until the load below is done
+        release = threading.Event()
+        write_compacted = persistence._write_compacted
+
+        def held_write_compacted(*args):
+            release.wait(5)
+            return write_compacted(*args)
+
+        persistence._write_compacted = held_write_compacted
+        compaction = asyncio.create_task(persistence.compact())
+        await asyncio.sleep(0.05)
+        self.assertEqual(persistence.load_user_data(7), {"value": 7})
+        update = asyncio.create_task(persistence.update_user_data(5, {"value": "new"}))
+        await asyncio.sleep(0)
+        release.set()
+        await compaction
+        await update
+
+        self.assertEqual(persistence.load_user_data(5), {"value": "new"})
+        self.assertEqual(persistence.load_user_data(7), {"value": 7})
+        await persistence.flush()
+
+        restarted = LogPersistence(self.path, lazy=True)
+        self.assertEqual(restarted.load_user_data(5), {"value": "new"})
+        self.assertEqual(restarted.load_user_data(7), {"value": 7})
+        await restarted.flush()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_book import OrderBook, OrderBooks, canonical_order  # noqa: E402
+from request_store import (  # noqa: E402
+    SIDE_BUY,
+    SIDE_SELL,
+    STATUS_FILLED,
+    STATUS_OPEN,
+    ExchangeRequest,
+)
+
+CURRENCIES = ("RUB", "USD", "TRY")
+
+_ids = itertools.count(1)
+
+
+def request(
+    user_id: int, side: str, base: str, quote: str, amount: float, price: float
+) -> ExchangeRequest:
+    return ExchangeRequest(
+        next(_ids), user_id, user_id, side, base, quote, amount, price, 0.0, STATUS_OPEN, 0.0
+    )
+
+
+class OrderBookMatchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.book = OrderBook("RUB", "USD")
+
+    def test_price_time_priority(self) -> None:
+        early_cheap = request(1, SIDE_SELL, "RUB", "USD", 10, 0.0105)
+        expensive = request(2, SIDE_SELL, "RUB", "USD", 10, 0.0110)
+        late_cheap = request(3, SIDE_SELL, "RUB", "USD", 10, 0.0105)
+        for resting in (expensive, late_cheap, early_cheap):
+            self.assertEqual(self.book.match(resting), [])
+
+        fills = self.book.match(request(4, SIDE_BUY, "RUB", "USD", 25, 0.0110))
+
+        self.assertEqual(
+            [(fill.sell, fill.amount, fill.price) for fill in fills],
+            [(early_cheap, 10, 0.0105), (late_cheap, 10, 0.0105), (expensive, 5, 0.0110)],
+        )
+
+    def test_no_fill_when_prices_do_not_cross(self) -> None:
+        ask = request(1, SIDE_SELL, "RUB", "USD", 10, 0.0110)
+        self.book.match(ask)
+
+        bid = request(2, SIDE_BUY, "RUB", "USD", 10, 0.0105)
+        self.assertEqual(self.book.match(bid), [])
+        self.assertIs(self.book.best_ask(), ask)
+        self.assertIs(self.book.best_bid(), bid)
+
+    def test_partial_fill_rests_remainder(self) -> None:
+        ask = request(1, SIDE_SELL, "RUB", "USD", 30, 0.0105)
+        self.book.match(ask)
+
+        bid = request(2, SIDE_BUY, "RUB", "USD", 10, 0.0110)
+        fills = self.book.match(bid)
+
+        self.assertEqual([(fill.amount, fill.price) for fill in fills], [(10, 0.0105)])
+        self.assertEqual(bid.status, STATUS_FILLED)
+        self.assertEqual(ask.status, STATUS_OPEN)
+        self.assertAlmostEqual(ask.remaining, 20)
+        self.assertIs(self.book.best_ask(), ask)
+        self.assertIsNone(self.book.best_bid())
+
+        bigger = request(3, SIDE_BUY, "RUB", "USD", 50, 0.0105)
+        self.book.match(bigger)
+        self.assertEqual(ask.status, STATUS_FILLED)
+        self.assertAlmostEqual(bigger.remaining, 30)
+        self.assertIs(self.book.best_bid(), bigger)
+
+    def test_own_orders_are_skipped_and_kept(self) -> None:
+        own = request(10, SIDE_SELL, "RUB", "USD", 10, 0.0100)
+        other = request(20, SIDE_SELL, "RUB", "USD", 10, 0.0105)
+        self.book.match(own)
+        self.book.match(other)
+
+        fills = self.book.match(request(10, SIDE_BUY, "RUB", "USD", 10, 0.0110))
+
+        self.assertEqual([fill.sell for fill in fills], [other])
+        self.assertEqual(own.status, STATUS_OPEN)
+        self.assertIs(self.book.best_ask(), own)
+
+
+class MirrorPairTest(unittest.TestCase):
+    def test_canonical_order_keeps_main_direction(self) -> None:
+        self.assertEqual(
+            canonical_order(SIDE_BUY, "RUB", "USD", 9500, 0.0105, CURRENCIES),
+            (SIDE_BUY, "RUB", "USD", 9500, 0.0105),
+        )
+
+    def test_canonical_order_converts_reverse_direction(self) -> None:
+        side, base, quote, amount, price = canonical_order(
+            SIDE_BUY, "USD", "RUB", 100, 95, CURRENCIES
+        )
+        self.assertEqual((side, base, quote), (SIDE_SELL, "RUB", "USD"))
+        self.assertAlmostEqual(amount, 9500)
+        self.assertAlmostEqual(price, 1 / 95)
+
+    def test_reverse_pair_orders_match(self) -> None:
+        books = OrderBooks()
+        # Покупка 9500 RUB за USD и покупка 100 USD за RUB - встречные заявки
+        buy_rub = request(1, *canonical_order(SIDE_BUY, "RUB", "USD", 9500, 1 / 95, CURRENCIES))
+        self.assertEqual(books.match(buy_rub), [])
+
+        side, base, quote, amount, price = canonical_order(
+            SIDE_BUY, "USD", "RUB", 100, 95, CURRENCIES
+        )
+        buy_usd = request(2, side, base, quote, amount, price)
+        fills = books.match(buy_usd)
+
+        self.assertEqual(len(fills), 1)
+        self.assertIs(fills[0].buy, buy_rub)
+        self.assertIs(fills[0].sell, buy_usd)
+        self.assertAlmostEqual(fills[0].amount, 9500)
+        self.assertEqual(buy_rub.status, STATUS_FILLED)
+        self.assertEqual(buy_usd.status, STATUS_FILLED)
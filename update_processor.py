@@ -0,0 +1,104 @@
+import asyncio
+from typing import Awaitable, Dict, Hashable, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Лимит семафора BaseUpdateProcessor.process_update. Этот семафор охватывает и ожидание
+# в очереди чата, поэтому ограничивать он не должен: общий лимит - _global_slots
+UNLIMITED_UPDATES = 2**31 - 1
+
+
+# Очередь одного чата: замок и число обновлений, ждущих или обрабатываемых
+class _ChatQueue:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+# Обработчик обновлений: обновления одного чата строго по порядку,
+# разные чаты - параллельно, не больше max_concurrent_updates одновременно.
+# Обновление сначала ждёт свою очередь в чате и только потом занимает общий слот,
+# поэтому поток сообщений из одного чата не забирает слоты у остальных.
+# asyncio.Lock отдаёт замок ожидающим в порядке очереди, а Application создаёт
+# задачи в порядке поступления обновлений - так сохраняется порядок внутри чата.
+# Очереди и слоты реализованы в do_process_update (process_update в PTB - final).
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int) -> None:
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates должно быть положительным")
+        super().__init__(UNLIMITED_UPDATES)
+        self.limit = max_concurrent_updates
+        self._queues: Dict[Hashable, _ChatQueue] = {}
+        self._global_slots = asyncio.Semaphore(max_concurrent_updates)
+        self.waiting = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.max_depth = 0
+
+    # Ключ очереди: чат, иначе пользователь; обновления без них не упорядочиваются
+    @staticmethod
+    def get_key(update: object) -> Optional[Hashable]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = self.get_key(update)
+        if key is None:
+            self.waiting += 1
+            async with self._global_slots:
+                await self._run(update, coroutine)
+            return
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _ChatQueue()
+        queue.depth += 1
+        self.waiting += 1
+        self.max_depth = max(self.max_depth, queue.depth)
+        try:
+            async with queue.lock, self._global_slots:
+                await self._run(update, coroutine)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._queues[key]
+
+    async def _run(self, update: object, coroutine: Awaitable) -> None:
+        self.waiting -= 1
+        self.in_flight += 1
+        try:
+            await coroutine
+        finally:
+            self.in_flight -= 1
+            self.processed += 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    # Статистика: обработано, в работе, ждут, глубина очередей по чатам
+    def stats(self, top: int = 5) -> Dict[str, object]:
+        depths: List[Tuple[Hashable, int]] = sorted(
+            ((key, queue.depth) for key, queue in self._queues.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return {
+            "max_concurrent_updates": self.limit,
+            "processed": self.processed,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "active_chats": len(depths),
+            "max_depth": self.max_depth,
+            "deepest": depths[:top],
+        }